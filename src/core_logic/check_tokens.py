@@ -14,7 +14,6 @@ Date: October 2025
 
 import argparse
 import os
-import json
 import logging
 import sys
 from typing import Dict, Any
@@ -22,11 +21,16 @@ from typing import Dict, Any
 # Third-party imports
 import google.generativeai as genai
 import pandas as pd
-from dotenv import load_dotenv
+
+# Tokenizer lokal opsional untuk estimasi token tanpa request ke API
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 # Import fungsi yang sudah ada dari proyek (code reusability)
 try:
-    from .process import open_dataset, load_prompt_template
+    from .process import open_dataset, load_prompt_template, compile_prompt_template, _dumps_batch_json
     from .env_manager import load_env_variables
     from .request_tracker import log_request
 except ImportError as e:
@@ -37,6 +41,9 @@ except ImportError as e:
 # Konfigurasi logging sederhana untuk skrip ini
 logging.basicConfig(level=logging.WARNING)  # Hanya tampilkan warning dan error
 
+# Encoding tiktoken di-cache setelah pemanggilan pertama (False = tidak tersedia)
+_local_encoding = None
+
 
 def setup_gemini_api() -> str:
     """
@@ -48,53 +55,36 @@ def setup_gemini_api() -> str:
     Raises:
         ValueError: Jika API key tidak ditemukan
     """
-    load_dotenv()
-    
-    # Coba ambil API key dari environment
-    api_key = os.getenv('GOOGLE_API_KEY_1')
-    if not api_key:
+    # Gunakan hasil load_env_variables yang sudah di-cache (tanpa parse .env ulang)
+    settings, api_keys = load_env_variables()
+    if not api_keys:
         raise ValueError("❌ GOOGLE_API_KEY_1 tidak ditemukan di file .env")
     
     # Konfigurasi Gemini API
-    genai.configure(api_key=api_key)
+    genai.configure(api_key=api_keys[0])
     
-    # Ambil model name dari environment atau gunakan default
-    model_name = os.getenv('MODEL_NAME', 'gemini-1.5-pro-latest')
-    
-    return model_name
+    # Model name dari .env (default: model pertama di fallback list)
+    return settings['MODEL_NAME']
 
 
-def create_sample_prompt(df_sample: pd.DataFrame, text_column: str) -> str:
+def _load_sample_prompt_template() -> str:
     """
-    Membuat prompt sampel yang identik dengan yang digunakan dalam proses pelabelan utama.
+    Memuat template prompt dalam format yang sama dengan `load_prompt_template`
+    (kurung kurawal ter-escape kecuali placeholder {data_json}).
+
+    Cache-nya milik `load_prompt_template` (per mtime file), sehingga perubahan
+    prompt_template.txt langsung terpakai di GUI yang berjalan lama.
     
-    Args:
-        df_sample: DataFrame sampel untuk dianalisis
-        text_column: Nama kolom yang berisi teks
-        
     Returns:
-        str: Prompt yang sudah diformat
+        str: Template siap untuk `compile_prompt_template`
     """
-    # Pastikan ada kolom 'id'
-    if 'id' not in df_sample.columns:
-        df_sample = df_sample.copy()
-        df_sample['id'] = range(len(df_sample))
-    
-    # Siapkan data dalam format yang sama dengan proses utama
-    data_to_process = df_sample[['id', text_column]].to_dict(orient='records')
-    data_json_string = json.dumps(data_to_process, indent=2, ensure_ascii=False)
-    
-    # Load template prompt (menggunakan fungsi yang sudah ada)
     try:
-        prompt_template = load_prompt_template()
-        # Escape curly braces untuk mencegah format error
-        prompt_template = prompt_template.replace('{', '{{').replace('}', '}}')
-        # Kembalikan placeholder data_json
-        prompt_template = prompt_template.replace('{{data_json}}', '{data_json}')
+        # Load template prompt (menggunakan fungsi yang sudah ada; sudah ter-escape)
+        return load_prompt_template()
     except FileNotFoundError:
         print("⚠️  Warning: File prompt_template.txt tidak ditemukan.")
         print("   Menggunakan template default untuk analisis...")
-        prompt_template = """
+        return """
 Analisis sentimen untuk data berikut dalam format JSON:
 
 {data_json}
@@ -105,25 +95,38 @@ Berikan hasil dalam format JSON array dengan struktur:
   ...
 ]
 """
-    
-    # Format prompt dengan data JSON
-    full_prompt = prompt_template.format(data_json=data_json_string)
-    
-    return full_prompt
 
 
-def calculate_token_metrics(model: Any, prompt: str, total_rows: int, batch_size: int) -> Dict[str, Any]:
+def create_sample_prompt(df_sample: pd.DataFrame, text_column: str) -> str:
     """
-    Menghitung metrik token dan estimasi biaya.
+    Membuat prompt sampel yang identik dengan yang digunakan dalam proses pelabelan utama.
     
     Args:
-        model: Model Gemini yang sudah diinisialisasi
-        prompt: Prompt yang akan dianalisis
-        total_rows: Total baris dalam dataset
-        batch_size: Ukuran batch
+        df_sample: DataFrame sampel untuk dianalisis (tidak dimodifikasi,
+            sehingga boleh berupa view dari dataset asli)
+        text_column: Nama kolom yang berisi teks
         
     Returns:
-        Dict dengan metrik token dan biaya
+        str: Prompt yang sudah diformat
+    """
+    # Gunakan kolom 'id' jika ada; jika tidak, id berurutan tanpa menyalin DataFrame
+    ids = df_sample['id'].tolist() if 'id' in df_sample.columns else range(len(df_sample))
+    
+    # Siapkan data dalam format yang sama dengan proses utama
+    data_to_process = [
+        {'id': row_id, text_column: text}
+        for row_id, text in zip(ids, df_sample[text_column].tolist())
+    ]
+    
+    # Serialisasi dan penyusunan prompt lewat fungsi yang sama dengan proses utama (JSON ringkas)
+    prompt_segments = compile_prompt_template(_load_sample_prompt_template())
+    return _dumps_batch_json(data_to_process).join(prompt_segments)
+
+
+def _count_tokens_via_api(model: Any, prompt: str, total_rows: int, batch_size: int) -> int:
+    """
+    Menghitung token prompt via `model.count_tokens` dengan request tracking.
+    Fallback ke estimasi lokal jika request gagal.
     """
     # Hitung token untuk prompt sampel dengan tracking
     import time
@@ -148,14 +151,14 @@ def calculate_token_metrics(model: Any, prompt: str, total_rows: int, batch_size
         
         # Force save untuk persistence
         from .request_tracker import get_request_tracker
-        get_request_tracker()._save_session_stats()
+        get_request_tracker().flush()
         
     except Exception as e:
         error_message = f"Gagal menghitung token: {e}"
         print(f"⚠️  Warning: {error_message}")
         # Fallback: estimasi berdasarkan panjang karakter (rough estimation)
-        input_tokens = len(prompt) // 4  # Rough estimate: 1 token ≈ 4 characters
-        print(f"   Menggunakan estimasi berdasarkan panjang karakter: {input_tokens} token")
+        input_tokens = estimate_tokens_locally(prompt)
+        print(f"   Menggunakan estimasi token lokal: {input_tokens} token")
         
         # Log failed request
         log_request(
@@ -169,8 +172,63 @@ def calculate_token_metrics(model: Any, prompt: str, total_rows: int, batch_size
         
         # Force save untuk persistence
         from .request_tracker import get_request_tracker
-        get_request_tracker()._save_session_stats()
+        get_request_tracker().flush()
+
+    return input_tokens
+
+
+def estimate_tokens_locally(prompt: str) -> int:
+    """
+    Mengestimasi jumlah token secara lokal tanpa request ke Gemini API.
+
+    Menggunakan tokenizer `tiktoken` (cl100k_base) jika terpasang, jika tidak
+    menggunakan estimasi kasar 1 token ≈ 4 karakter.
+
+    `tiktoken.get_encoding` mengunduh file BPE pada pemakaian pertama (lalu
+    di-cache di disk); jika unduhan gagal (misalnya offline), estimasi kasar
+    yang dipakai.
+
+    Args:
+        prompt: Teks yang akan dihitung tokennya
+
+    Returns:
+        int: Estimasi jumlah token
+    """
+    global _local_encoding
+
+    if _local_encoding is None:
+        _local_encoding = False
+        if tiktoken is not None:
+            try:
+                _local_encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logging.warning(f"⚠️ Gagal memuat tokenizer tiktoken: {e}")
+
+    if _local_encoding:
+        return len(_local_encoding.encode(prompt))
+    return len(prompt) // 4  # Rough estimate: 1 token ≈ 4 characters
+
+
+def calculate_token_metrics(model: Any, prompt: str, total_rows: int, batch_size: int, accurate: bool = False) -> Dict[str, Any]:
+    """
+    Menghitung metrik token dan estimasi biaya.
     
+    Args:
+        model: Model Gemini yang sudah diinisialisasi
+        prompt: Prompt yang akan dianalisis
+        total_rows: Total baris dalam dataset
+        batch_size: Ukuran batch
+        accurate: Jika True, hitung token via `model.count_tokens` (request API).
+            Jika False (default), gunakan estimasi lokal tanpa request ke API.
+        
+    Returns:
+        Dict dengan metrik token dan biaya
+    """
+    if not accurate:
+        input_tokens = estimate_tokens_locally(prompt)
+    else:
+        input_tokens = _count_tokens_via_api(model, prompt, total_rows, batch_size)
+
     # Hitung metrik batch dan total
     total_batches = (total_rows + batch_size - 1) // batch_size  # Ceiling division
     total_input_tokens = input_tokens * total_batches
@@ -279,7 +337,7 @@ def print_analysis_report(
     print(report)
 
 
-def analyze_tokens(dataset_name: str, text_column: str, batch_size: int) -> None:
+def analyze_tokens(dataset_name: str, text_column: str, batch_size: int, accurate: bool = False) -> None:
     """
     Fungsi utama untuk menganalisis token dan estimasi biaya.
     
@@ -287,14 +345,19 @@ def analyze_tokens(dataset_name: str, text_column: str, batch_size: int) -> None
         dataset_name: Nama dataset (tanpa ekstensi)
         text_column: Nama kolom teks yang akan dianalisis
         batch_size: Ukuran batch untuk simulasi
+        accurate: Hitung token via Gemini API (count_tokens) alih-alih estimasi lokal
     """
     try:
         print(f"🚀 Memulai analisis token untuk dataset '{dataset_name}'...")
         
-        # 1. Setup Gemini API
-        print("🔧 Mengatur konfigurasi Gemini API...")
-        model_name = setup_gemini_api()
-        model = genai.GenerativeModel(model_name)
+        # 1. Setup Gemini API (hanya diperlukan untuk perhitungan token akurat)
+        if accurate:
+            print("🔧 Mengatur konfigurasi Gemini API...")
+            model_name = setup_gemini_api()
+            model = genai.GenerativeModel(model_name)
+        else:
+            model_name = load_env_variables()[0]['MODEL_NAME']
+            model = None
         
         # 2. Load dataset
         print(f"📂 Memuat dataset dari direktori...")
@@ -316,7 +379,7 @@ def analyze_tokens(dataset_name: str, text_column: str, batch_size: int) -> None
         
         # 4. Ambil sampel batch pertama
         sample_size = min(batch_size, len(df))
-        df_sample = df.head(sample_size).copy()
+        df_sample = df.head(sample_size)
         print(f"   Menganalisis {sample_size} baris pertama sebagai sampel...")
         
         # 5. Buat prompt sampel
@@ -329,7 +392,7 @@ def analyze_tokens(dataset_name: str, text_column: str, batch_size: int) -> None
         
         # 6. Hitung token dan metrik
         print("🔢 Menghitung token dan estimasi biaya...")
-        metrics = calculate_token_metrics(model, sample_prompt, len(df), batch_size)
+        metrics = calculate_token_metrics(model, sample_prompt, len(df), batch_size, accurate=accurate)
         
         # 7. Tampilkan laporan
         print_analysis_report(
@@ -372,6 +435,7 @@ Contoh penggunaan:
   python check_tokens.py --dataset my_tweets --column tweet_text --batch-size 300
   python check_tokens.py --dataset survey_data --column response_text --batch-size 100
   python check_tokens.py --dataset feedback --column comment
+  python check_tokens.py --dataset feedback --column comment --accurate
         """
     )
     
@@ -396,6 +460,12 @@ Contoh penggunaan:
         help='Ukuran batch untuk disimulasikan (default: 300)'
     )
     
+    parser.add_argument(
+        '--accurate',
+        action='store_true',
+        help='Hitung token via Gemini API (count_tokens) alih-alih estimasi lokal'
+    )
+    
     # Parse argumen
     args = parser.parse_args()
     
@@ -408,7 +478,8 @@ Contoh penggunaan:
     analyze_tokens(
         dataset_name=args.dataset,
         text_column=args.column,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        accurate=args.accurate
     )
 
 
@@ -1,95 +1,218 @@
 # src/core_logic/env_manager.py
 
 import os
+import re
 import logging
-from dotenv import load_dotenv, set_key, find_dotenv
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from dotenv import load_dotenv, find_dotenv
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
-def load_env_variables() -> Tuple[Dict[str, str], List[str]]:
+from .response_cache import DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES
+
+# Nama variabel API key bernomor: GOOGLE_API_KEY_1, GOOGLE_API_KEY_2, ...
+API_KEY_PATTERN = re.compile(r"^GOOGLE_API_KEY_(\d+)$")
+
+# Pemisah MODEL_FALLBACK_LIST: koma beserta whitespace di sekitarnya
+MODEL_LIST_SEPARATOR = re.compile(r"\s*,\s*")
+
+# Format checkpoint per batch (BATCH_FMT); yang pertama adalah default
+BATCH_FORMATS = ("parquet", "xlsx")
+
+# Batas request per menit per API key (GEMINI_RPM); 0 = tanpa pembatas
+DEFAULT_GEMINI_RPM = 0.0
+# Total batch berjalan bersamaan (CONCURRENCY); 0 = satu batch per API key
+DEFAULT_CONCURRENCY = 0
+# Checkpoint ditulis setiap sekian batch (CHECKPOINT_EVERY); sisa progress ditulis saat
+# writer ditutup. Batch yang hilang karena crash diambil lagi dari cache respons
+DEFAULT_CHECKPOINT_EVERY = 10
+
+# Nilai boolean yang dikenali di .env
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_FALSE_VALUES = ("0", "false", "no", "off")
+
+# Path file .env yang sudah ditemukan (lihat _get_env_path)
+_ENV_PATH: Optional[str] = None
+
+def _parse_choice(name: str, choices: Tuple[str, ...]) -> str:
+    """Membaca setting pilihan dari environment; nilai tidak dikenal diganti default (pilihan pertama)."""
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return choices[0]
+    if value not in choices:
+        logging.warning(f"⚠️ {name}={value!r} tidak dikenal (pilihan: {', '.join(choices)}), memakai {choices[0]!r}.")
+        return choices[0]
+    return value
+
+def _parse_number(name: str, default: Any, cast: Callable[[str], Any], minimum: float) -> Any:
+    """Membaca setting angka dari environment; nilai rusak atau di bawah `minimum` diganti default."""
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        value = None
+    # `not >=` juga menolak NaN
+    if value is None or not value >= minimum:
+        logging.warning(f"⚠️ {name}={raw!r} tidak valid (harus angka >= {minimum:g}), memakai {default!r}.")
+        return default
+    return value
+
+def _parse_bool(name: str, default: bool) -> bool:
+    """Membaca setting boolean dari environment; nilai tidak dikenal diganti default."""
+    raw = os.environ.get(name, "").strip().lower()
+    if not raw:
+        return default
+    if raw in _TRUE_VALUES:
+        return True
+    if raw in _FALSE_VALUES:
+        return False
+    logging.warning(f"⚠️ {name}={raw!r} bukan nilai boolean, memakai {default}.")
+    return default
+
+@lru_cache(maxsize=1)
+def load_env_variables() -> Tuple[Mapping[str, Any], Tuple[str, ...]]:
     """
     Memuat variabel konfigurasi dan API keys dari file .env.
 
+    Hasil di-cache per proses; `save_env_variables` mengosongkan cache ini.
+    Karena di-cache, nilai yang dikembalikan bersifat read-only: salin dengan
+    `dict(settings)` / `list(api_keys)` jika perlu diubah.
+
     Returns:
-        Tuple[Dict[str, str], List[str]]: 
+        Tuple[Mapping[str, Any], Tuple[str, ...]]: 
         Sebuah tuple berisi:
-        - Dictionary untuk setting umum (MODEL_NAME, dll.)
-        - List berisi API keys.
+        - Mapping read-only untuk setting umum (MODEL_NAME, dll.)
+        - Tuple berisi API keys.
     """
     load_dotenv()
+    environ = os.environ
     
     # Load model fallback list
-    model_fallback_str = os.getenv("MODEL_FALLBACK_LIST", "")
-    if model_fallback_str:
-        # Parse comma-separated string menjadi list, hapus whitespace
-        model_list = [model.strip() for model in model_fallback_str.split(",") if model.strip()]
-    else:
-        # Default fallback list jika tidak ada di .env
-        model_list = ["gemini-1.5-pro-latest", "gemini-1.5-flash-latest"]
+    model_fallback_str = environ.get("MODEL_FALLBACK_LIST", "")
+    # Parse comma-separated string menjadi list (whitespace di sekitar koma ikut terbuang)
+    model_list = tuple(model for model in MODEL_LIST_SEPARATOR.split(model_fallback_str.strip()) if model)
+    if not model_list:
+        # Default fallback list jika tidak ada (atau kosong) di .env
+        model_list = ("gemini-1.5-pro-latest", "gemini-1.5-flash-latest")
     
     settings = {
-        "MODEL_NAME": os.getenv("MODEL_NAME", model_list[0]),  # Default ke model pertama dalam list
-        "OUTPUT_DIR": os.getenv("OUTPUT_DIR", "results"),
-        "DATASET_DIR": os.getenv("DATASET_DIR", "dataset"),
+        "MODEL_NAME": environ.get("MODEL_NAME", model_list[0]),  # Default ke model pertama dalam list
+        "OUTPUT_DIR": environ.get("OUTPUT_DIR", "results"),
+        "DATASET_DIR": environ.get("DATASET_DIR", "dataset"),
         "MODEL_LIST": model_list,  # Tambahkan model fallback list
+        "BATCH_FMT": _parse_choice("BATCH_FMT", BATCH_FORMATS),
+        # Setting opsional divalidasi di sini agar nilai rusak tidak menggagalkan session
+        "GEMINI_RPM": _parse_number("GEMINI_RPM", DEFAULT_GEMINI_RPM, float, 0),
+        "CONCURRENCY": _parse_number("CONCURRENCY", DEFAULT_CONCURRENCY, int, 0),
+        "CHECKPOINT_EVERY": _parse_number("CHECKPOINT_EVERY", DEFAULT_CHECKPOINT_EVERY, int, 1),
+        "PROMPT_CACHE": _parse_bool("PROMPT_CACHE", False),
+        "RESPONSE_CACHE": _parse_bool("RESPONSE_CACHE", True),
+        "CACHE_TTL": _parse_number("CACHE_TTL", DEFAULT_TTL_SECONDS, float, 0),
+        "CACHE_MAX_ENTRIES": _parse_number("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES, int, 1),
     }
     
-    api_keys = []
-    i = 1
-    while True:
-        key = os.getenv(f"GOOGLE_API_KEY_{i}")
-        if key:
-            api_keys.append(key)
-            i += 1
-        else:
-            break
+    # Satu kali scan os.environ, urutkan berdasarkan nomor key (bukan urutan string)
+    numbered_keys = []
+    for env_name, value in environ.items():
+        match = API_KEY_PATTERN.match(env_name)
+        if match and value:
+            numbered_keys.append((int(match.group(1)), value))
+    api_keys = [value for _, value in sorted(numbered_keys)]
             
-    return settings, api_keys
+    return MappingProxyType(settings), tuple(api_keys)
 
-def save_env_variables(settings: Dict[str, str], api_keys: List[str]):
+def _get_env_path() -> str:
     """
-    Menyimpan settings dan API keys ke dalam file .env.
-    Akan membuat file .env jika belum ada.
+    Mengembalikan path file .env (di-cache setelah ditemukan).
+    Akan membuat file .env kosong jika belum ada.
     """
+    global _ENV_PATH
+    if _ENV_PATH and os.path.exists(_ENV_PATH):
+        return _ENV_PATH
+
     env_file = find_dotenv()
     if not env_file:
         # Jika .env tidak ada, buat file kosong
         with open(".env", "w") as f:
             pass
-        env_file = find_dotenv()
+        env_file = os.path.abspath(".env")
+
+    _ENV_PATH = env_file
+    return _ENV_PATH
+
+def _format_env_line(key: str, value: str) -> str:
+    """Memformat satu baris .env dengan quoting yang sama seperti `dotenv.set_key`."""
+    return "{}='{}'\n".format(key, str(value).replace("'", "\\'"))
+
+def save_env_variables(settings: Dict[str, str], api_keys: List[str]):
+    """
+    Menyimpan settings dan API keys ke dalam file .env.
+    Akan membuat file .env jika belum ada.
+
+    File dibaca sekali, diubah di memori, lalu ditulis sekali: baris setting
+    yang sudah ada diganti di tempat, semua GOOGLE_API_KEY_ lama dibuang, dan
+    key baru/setting baru ditambahkan di akhir file.
+    """
+    env_file = _get_env_path()
+
+    pending_settings = dict(settings)
 
-    # Menyimpan settings umum
-    for key, value in settings.items():
-        set_key(env_file, key, value)
-        
-    # Menghapus key lama sebelum menulis yang baru untuk menghindari sisa
-    # (Ini adalah pendekatan sederhana, library dotenv tidak punya fungsi 'unset')
-    # Kita akan baca semua, hapus yang GOOGLE_API_KEY, lalu tulis ulang
     with open(env_file, 'r') as f:
         lines = f.readlines()
-    with open(env_file, 'w') as f:
-        for line in lines:
-            if not line.strip().startswith('GOOGLE_API_KEY_'):
-                f.write(line)
+
+    new_lines = []
+    for line in lines:
+        stripped = line.strip()
+        # API key lama selalu dibuang agar tidak ada sisa (ditulis ulang di bawah)
+        if stripped.startswith('GOOGLE_API_KEY_'):
+            continue
+        name = stripped.split('=', 1)[0].strip()
+        if name.startswith('export '):
+            name = name[len('export '):].strip()
+        if '=' in stripped and name in pending_settings:
+            new_lines.append(_format_env_line(name, pending_settings.pop(name)))
+        else:
+            new_lines.append(line)
+
+    # Pastikan baris terakhir diakhiri newline sebelum menambahkan key baru
+    if new_lines and not new_lines[-1].endswith('\n'):
+        new_lines[-1] += '\n'
+
+    # Setting yang belum ada di file
+    for key, value in pending_settings.items():
+        new_lines.append(_format_env_line(key, value))
 
     # Menulis API keys yang baru
     for i, key_value in enumerate(api_keys, 1):
         if key_value.strip(): # Hanya simpan jika tidak kosong
-            set_key(env_file, f"GOOGLE_API_KEY_{i}", key_value)
+            new_lines.append(_format_env_line(f"GOOGLE_API_KEY_{i}", key_value))
+
+    with open(env_file, 'w') as f:
+        f.writelines(new_lines)
 
-def load_and_log_config() -> Tuple[Dict[str, str], List[str]]:
+    # Konfigurasi berubah, paksa pembacaan ulang pada pemanggilan berikutnya
+    load_env_variables.cache_clear()
+
+def load_and_log_config() -> Tuple[Mapping[str, Any], Tuple[str, ...]]:
     """
     Memuat variabel konfigurasi dan API keys, lalu mencatatnya ke log.
+
+    Mengembalikan hasil `load_env_variables` apa adanya (read-only, di-cache).
     """
     settings, api_keys = load_env_variables() # Panggil fungsi yang sudah ada
 
-    logging.info("🔧 Konfigurasi Proyek Dimuat:")
-    for key, value in settings.items():
-        if key == "MODEL_LIST":
-            logging.info(f"   - {key}: {', '.join(value)}")
-        else:
-            logging.info(f"   - {key}: {value}")
-    
-    logging.info(f"📋 Model Fallback Sequence: {' → '.join(settings['MODEL_LIST'])}")
+    # Satu record log multi-baris alih-alih satu logging.info per setting;
+    # string hanya dibangun jika level INFO aktif
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        lines = ["🔧 Konfigurasi Proyek Dimuat:"]
+        lines.extend(
+            f"   - {key}: {', '.join(value) if key == 'MODEL_LIST' else value}"
+            for key, value in settings.items()
+        )
+        lines.append(f"📋 Model Fallback Sequence: {' → '.join(settings['MODEL_LIST'])}")
+        logging.info("\n".join(lines))
         
     if not api_keys:
         raise ValueError("❌ Tidak ada API Key di .env. Pastikan setidaknya GOOGLE_API_KEY_1 ada.")
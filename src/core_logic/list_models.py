@@ -15,14 +15,17 @@ Date: October 2025
 """
 
 import argparse
+import dataclasses
 import os
 import sys
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Tuple
 from datetime import datetime
 
 # Third-party imports
-import google.generativeai as genai
-from dotenv import load_dotenv
+# google.generativeai diimpor secara lazy di fungsi yang membutuhkannya
+# (inisialisasi gRPC/protobuf cukup berat untuk mode yang tidak memakai API)
 
 # Local imports
 try:
@@ -31,26 +34,40 @@ except ImportError as e:
     print(f"❌ Error: Tidak dapat mengimpor env_manager: {e}")
     sys.exit(1)
 
+# Status konfigurasi genai (lihat setup_gemini_api)
+_CONFIGURED = False
+
+# Prefix nama resource model dari API ("models/gemini-2.5-flash")
+_MODEL_PREFIX = "models/"
+_MODEL_PREFIX_LEN = len(_MODEL_PREFIX)
+
 
 def setup_gemini_api() -> bool:
     """
     Setup Gemini API dengan konfigurasi dari .env file.
     
+    Hanya dikonfigurasi sekali per proses; pemanggilan berikutnya langsung
+    mengembalikan True.
+    
     Returns:
         bool: True jika berhasil setup, False jika gagal
     """
+    global _CONFIGURED
+    if _CONFIGURED:
+        return True
+    
     try:
-        load_dotenv()
-        
-        # Coba ambil API key dari environment
-        api_key = os.getenv('GOOGLE_API_KEY_1')
-        if not api_key:
+        # Gunakan hasil load_env_variables yang sudah di-cache (tanpa parse .env ulang)
+        _, api_keys = load_env_variables()
+        if not api_keys:
             print("⚠️  Warning: GOOGLE_API_KEY_1 tidak ditemukan di file .env")
             print("   Beberapa fitur tidak akan tersedia tanpa API key.")
             return False
         
         # Konfigurasi Gemini API
-        genai.configure(api_key=api_key)
+        import google.generativeai as genai
+        genai.configure(api_key=api_keys[0])
+        _CONFIGURED = True
         return True
         
     except Exception as e:
@@ -58,118 +75,136 @@ def setup_gemini_api() -> bool:
         return False
 
 
-def get_predefined_models() -> List[Dict[str, Any]]:
+# Data model berdasarkan dokumentasi terbaru Gemini (Oktober 2025).
+# Dibangun sekali saat import; read-only karena dibagikan ke semua pemanggil.
+_PREDEFINED_MODELS = (
+    MappingProxyType({
+        "name": "gemini-2.5-pro",
+        "display_name": "Gemini 2.5 Pro",
+        "category": "Text-out models", 
+        "rpm": 5,
+        "tpm": 250000,
+        "rpd": 100,
+        "description": "Model premium dengan kualitas output terbaik, quota terbatas",
+        "best_for": "Tugas kompleks, analisis mendalam, kualitas tertinggi",
+        "supported_features": ("text", "json_mode", "function_calling")
+    }),
+    MappingProxyType({
+        "name": "gemini-2.5-flash", 
+        "display_name": "Gemini 2.5 Flash",
+        "category": "Text-out models",
+        "rpm": 10,
+        "tpm": 250000, 
+        "rpd": 250,
+        "description": "Balance optimal antara kualitas dan speed",
+        "best_for": "Sebagian besar use case, production workload",
+        "supported_features": ("text", "json_mode", "function_calling", "vision")
+    }),
+    MappingProxyType({
+        "name": "gemini-2.5-flash-preview",
+        "display_name": "Gemini 2.5 Flash Preview", 
+        "category": "Text-out models",
+        "rpm": 10,
+        "tpm": 250000,
+        "rpd": 250,
+        "description": "Preview version dengan fitur experimental",
+        "best_for": "Testing fitur baru, development",
+        "supported_features": ("text", "json_mode", "function_calling", "vision", "experimental")
+    }),
+    MappingProxyType({
+        "name": "gemini-2.5-flash-lite",
+        "display_name": "Gemini 2.5 Flash-Lite",
+        "category": "Text-out models", 
+        "rpm": 15,
+        "tpm": 250000,
+        "rpd": 1000,
+        "description": "High throughput dengan quota besar",
+        "best_for": "Batch processing, high volume tasks",
+        "supported_features": ("text", "json_mode")
+    }),
+    MappingProxyType({
+        "name": "gemini-2.5-flash-lite-preview",
+        "display_name": "Gemini 2.5 Flash-Lite Preview",
+        "category": "Text-out models",
+        "rpm": 15, 
+        "tpm": 250000,
+        "rpd": 1000,
+        "description": "Preview version dari Flash-Lite",
+        "best_for": "Testing high volume scenarios",
+        "supported_features": ("text", "json_mode", "experimental")
+    }),
+    MappingProxyType({
+        "name": "gemini-2.0-flash",
+        "display_name": "Gemini 2.0 Flash", 
+        "category": "Text-out models",
+        "rpm": 15,
+        "tpm": 1000000,
+        "rpd": 200,
+        "description": "High token limit dengan speed tinggi",
+        "best_for": "Long context tasks, document analysis",
+        "supported_features": ("text", "json_mode", "long_context")
+    }),
+    MappingProxyType({
+        "name": "gemini-2.0-flash-lite",
+        "display_name": "Gemini 2.0 Flash-Lite",
+        "category": "Text-out models",
+        "rpm": 30,
+        "tpm": 1000000, 
+        "rpd": 200,
+        "description": "Fastest model dengan very high RPM",
+        "best_for": "Real-time applications, speed critical tasks",
+        "supported_features": ("text", "json_mode", "real_time")
+    }),
+    # Legacy models untuk backward compatibility
+    MappingProxyType({
+        "name": "gemini-1.5-pro-latest",
+        "display_name": "Gemini 1.5 Pro Latest",
+        "category": "Legacy models",
+        "rpm": 2,
+        "tpm": 125000,
+        "rpd": 50,
+        "description": "Legacy model, masih didukung untuk backward compatibility",
+        "best_for": "Existing projects, migration planning",
+        "supported_features": ("text", "json_mode", "function_calling", "vision")
+    }),
+    MappingProxyType({
+        "name": "gemini-1.5-flash-latest", 
+        "display_name": "Gemini 1.5 Flash Latest",
+        "category": "Legacy models",
+        "rpm": 5,
+        "tpm": 125000,
+        "rpd": 100,
+        "description": "Legacy flash model",
+        "best_for": "Migration dari 1.5 ke 2.x",
+        "supported_features": ("text", "json_mode", "vision")
+    })
+)
+
+
+def _format_compact_row(i: int, model: Mapping[str, Any]) -> str:
+    """Memformat satu baris tabel ringkas untuk print_models_table."""
+    rpm = model.get('rpm', '?')
+    tpm = f"{model.get('tpm', 0):,}" if model.get('tpm') else '?'
+    rpd = model.get('rpd', '?')
+    category = model.get('category', 'Unknown')[:14]
+    
+    return f"{i:<4} {model['name']:<35} {rpm:<5} {tpm:<8} {rpd:<6} {category:<15}"
+
+
+# Baris tabel ringkas untuk _PREDEFINED_MODELS, diformat sekali saat import
+_PREDEFINED_COMPACT_ROWS = tuple(
+    _format_compact_row(i, model) for i, model in enumerate(_PREDEFINED_MODELS, 1)
+)
+
+
+def get_predefined_models() -> Tuple[Mapping[str, Any], ...]:
     """
     Mendapatkan daftar model Gemini yang sudah diketahui dengan informasi quota.
     
     Returns:
-        List[Dict]: Daftar model dengan informasi lengkap
+        Tuple[Mapping]: Daftar model (read-only) dengan informasi lengkap
     """
-    # Data model berdasarkan dokumentasi terbaru Gemini (Oktober 2025)
-    models = [
-        {
-            "name": "gemini-2.5-pro",
-            "display_name": "Gemini 2.5 Pro",
-            "category": "Text-out models", 
-            "rpm": 5,
-            "tpm": 250000,
-            "rpd": 100,
-            "description": "Model premium dengan kualitas output terbaik, quota terbatas",
-            "best_for": "Tugas kompleks, analisis mendalam, kualitas tertinggi",
-            "supported_features": ["text", "json_mode", "function_calling"]
-        },
-        {
-            "name": "gemini-2.5-flash", 
-            "display_name": "Gemini 2.5 Flash",
-            "category": "Text-out models",
-            "rpm": 10,
-            "tpm": 250000, 
-            "rpd": 250,
-            "description": "Balance optimal antara kualitas dan speed",
-            "best_for": "Sebagian besar use case, production workload",
-            "supported_features": ["text", "json_mode", "function_calling", "vision"]
-        },
-        {
-            "name": "gemini-2.5-flash-preview",
-            "display_name": "Gemini 2.5 Flash Preview", 
-            "category": "Text-out models",
-            "rpm": 10,
-            "tpm": 250000,
-            "rpd": 250,
-            "description": "Preview version dengan fitur experimental",
-            "best_for": "Testing fitur baru, development",
-            "supported_features": ["text", "json_mode", "function_calling", "vision", "experimental"]
-        },
-        {
-            "name": "gemini-2.5-flash-lite",
-            "display_name": "Gemini 2.5 Flash-Lite",
-            "category": "Text-out models", 
-            "rpm": 15,
-            "tpm": 250000,
-            "rpd": 1000,
-            "description": "High throughput dengan quota besar",
-            "best_for": "Batch processing, high volume tasks",
-            "supported_features": ["text", "json_mode"]
-        },
-        {
-            "name": "gemini-2.5-flash-lite-preview",
-            "display_name": "Gemini 2.5 Flash-Lite Preview",
-            "category": "Text-out models",
-            "rpm": 15, 
-            "tpm": 250000,
-            "rpd": 1000,
-            "description": "Preview version dari Flash-Lite",
-            "best_for": "Testing high volume scenarios",
-            "supported_features": ["text", "json_mode", "experimental"]
-        },
-        {
-            "name": "gemini-2.0-flash",
-            "display_name": "Gemini 2.0 Flash", 
-            "category": "Text-out models",
-            "rpm": 15,
-            "tpm": 1000000,
-            "rpd": 200,
-            "description": "High token limit dengan speed tinggi",
-            "best_for": "Long context tasks, document analysis",
-            "supported_features": ["text", "json_mode", "long_context"]
-        },
-        {
-            "name": "gemini-2.0-flash-lite",
-            "display_name": "Gemini 2.0 Flash-Lite",
-            "category": "Text-out models",
-            "rpm": 30,
-            "tpm": 1000000, 
-            "rpd": 200,
-            "description": "Fastest model dengan very high RPM",
-            "best_for": "Real-time applications, speed critical tasks",
-            "supported_features": ["text", "json_mode", "real_time"]
-        },
-        # Legacy models untuk backward compatibility
-        {
-            "name": "gemini-1.5-pro-latest",
-            "display_name": "Gemini 1.5 Pro Latest",
-            "category": "Legacy models",
-            "rpm": 2,
-            "tpm": 125000,
-            "rpd": 50,
-            "description": "Legacy model, masih didukung untuk backward compatibility",
-            "best_for": "Existing projects, migration planning",
-            "supported_features": ["text", "json_mode", "function_calling", "vision"]
-        },
-        {
-            "name": "gemini-1.5-flash-latest", 
-            "display_name": "Gemini 1.5 Flash Latest",
-            "category": "Legacy models",
-            "rpm": 5,
-            "tpm": 125000,
-            "rpd": 100,
-            "description": "Legacy flash model",
-            "best_for": "Migration dari 1.5 ke 2.x",
-            "supported_features": ["text", "json_mode", "vision"]
-        }
-    ]
-    
-    return models
+    return _PREDEFINED_MODELS
 
 
 def get_available_models_from_api() -> List[Dict[str, Any]]:
@@ -180,16 +215,24 @@ def get_available_models_from_api() -> List[Dict[str, Any]]:
         List[Dict]: Daftar model dari API
     """
     try:
+        import google.generativeai as genai
+        
+        # Cek sekali di level class apakah SDK menyediakan field token limit,
+        # agar tidak perlu getattr(..., default) untuk setiap model
+        model_fields = {field.name for field in dataclasses.fields(genai.types.Model)}
+        has_token_limits = {'input_token_limit', 'output_token_limit'} <= model_fields
+        
         models = []
         for model in genai.list_models():
             if 'generateContent' in model.supported_generation_methods:
+                name = model.name
                 models.append({
-                    "name": model.name.replace('models/', ''),
+                    "name": name[_MODEL_PREFIX_LEN:] if name.startswith(_MODEL_PREFIX) else name,
                     "display_name": model.display_name,
                     "description": model.description or "No description available",
                     "supported_methods": model.supported_generation_methods,
-                    "input_token_limit": getattr(model, 'input_token_limit', 'Unknown'),
-                    "output_token_limit": getattr(model, 'output_token_limit', 'Unknown')
+                    "input_token_limit": model.input_token_limit if has_token_limits else 'Unknown',
+                    "output_token_limit": model.output_token_limit if has_token_limits else 'Unknown'
                 })
         return models
     except Exception as e:
@@ -205,95 +248,155 @@ def print_models_table(models: List[Dict[str, Any]], show_details: bool = False)
         models: Daftar model untuk ditampilkan
         show_details: True untuk menampilkan detail lengkap
     """
-    print("\n" + "="*100)
-    print("🤖 DAFTAR MODEL GEMINI YANG TERSEDIA")
-    print("="*100)
+    lines = []
+    lines.append("\n" + "="*100)
+    lines.append("🤖 DAFTAR MODEL GEMINI YANG TERSEDIA")
+    lines.append("="*100)
     
     if show_details:
         # Mode detail - tampilkan informasi lengkap
         for i, model in enumerate(models, 1):
-            print(f"\n📋 {i}. {model['display_name']}")
-            print(f"   Model Name    : {model['name']}")
-            print(f"   Category      : {model.get('category', 'Unknown')}")
+            lines.append(f"\n📋 {i}. {model['display_name']}")
+            lines.append(f"   Model Name    : {model['name']}")
+            lines.append(f"   Category      : {model.get('category', 'Unknown')}")
             
             if 'rpm' in model:
-                print(f"   Quota Limits  : {model['rpm']} RPM | {model['tpm']:,} TPM | {model['rpd']} RPD")
+                lines.append(f"   Quota Limits  : {model['rpm']} RPM | {model['tpm']:,} TPM | {model['rpd']} RPD")
             
-            print(f"   Description   : {model.get('description', 'No description')}")
-            print(f"   Best For      : {model.get('best_for', 'General use')}")
+            lines.append(f"   Description   : {model.get('description', 'No description')}")
+            lines.append(f"   Best For      : {model.get('best_for', 'General use')}")
             
             if 'supported_features' in model:
                 features = ', '.join(model['supported_features'])
-                print(f"   Features      : {features}")
+                lines.append(f"   Features      : {features}")
             
             if 'input_token_limit' in model:
-                print(f"   Token Limits  : Input={model['input_token_limit']} | Output={model['output_token_limit']}")
+                lines.append(f"   Token Limits  : Input={model['input_token_limit']} | Output={model['output_token_limit']}")
                 
     else:
         # Mode ringkas - tabel kompak
-        print(f"\n{'No.':<4} {'Model Name':<35} {'RPM':<5} {'TPM':<8} {'RPD':<6} {'Category':<15}")
-        print("-" * 100)
+        lines.append(f"\n{'No.':<4} {'Model Name':<35} {'RPM':<5} {'TPM':<8} {'RPD':<6} {'Category':<15}")
+        lines.append("-" * 100)
         
-        for i, model in enumerate(models, 1):
-            rpm = model.get('rpm', '?')
-            tpm = f"{model.get('tpm', 0):,}" if model.get('tpm') else '?'
-            rpd = model.get('rpd', '?')
-            category = model.get('category', 'Unknown')[:14]
-            
-            print(f"{i:<4} {model['name']:<35} {rpm:<5} {tpm:<8} {rpd:<6} {category:<15}")
+        if models is _PREDEFINED_MODELS:
+            # Baris untuk daftar predefined sudah diformat saat import
+            lines.extend(_PREDEFINED_COMPACT_ROWS)
+        else:
+            lines.extend(_format_compact_row(i, model) for i, model in enumerate(models, 1))
+    
+    # Satu kali write ke stdout alih-alih print per baris
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+# Rekomendasi model per use case (data statis, dibangun sekali saat import)
+_RECOMMENDATIONS = (
+    MappingProxyType({
+        "use_case": "🎯 Kualitas Tertinggi (Budget Tidak Terbatas)",
+        "models": ("gemini-2.5-pro",),
+        "notes": "RPD rendah (100), cocok untuk dataset kecil premium"
+    }),
+    MappingProxyType({
+        "use_case": "⚖️ Balance Kualitas & Throughput (Recommended)",
+        "models": ("gemini-2.5-flash", "gemini-2.5-flash-preview"),
+        "notes": "RPD sedang (250), ideal untuk sebagian besar project"
+    }),
+    MappingProxyType({
+        "use_case": "🚀 High Volume Processing",
+        "models": ("gemini-2.5-flash-lite", "gemini-2.5-flash-lite-preview"),
+        "notes": "RPD tinggi (1000), optimal untuk dataset besar"
+    }),
+    MappingProxyType({
+        "use_case": "📄 Long Context Documents",
+        "models": ("gemini-2.0-flash",),
+        "notes": "TPM tinggi (1M), cocok untuk dokumen panjang"
+    }),
+    MappingProxyType({
+        "use_case": "⚡ Speed Critical Applications",
+        "models": ("gemini-2.0-flash-lite",),
+        "notes": "RPM tertinggi (30), real-time processing"
+    }),
+    MappingProxyType({
+        "use_case": "🔄 Migration dari 1.5.x",
+        "models": ("gemini-1.5-pro-latest", "gemini-1.5-flash-latest"),
+        "notes": "Backward compatibility, akan deprecated"
+    })
+)
+
+
+# Konfigurasi MODEL_FALLBACK_LIST yang disarankan (data statis)
+_FALLBACK_CONFIGS = MappingProxyType({
+    "Quality First (Recommended)": (
+        "gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.0-flash-lite"
+    ),
+    "Balanced": (
+        "gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.0-flash", "gemini-2.0-flash-lite"
+    ),
+    "High Volume": (
+        "gemini-2.5-flash-lite", "gemini-2.0-flash-lite", "gemini-2.0-flash", "gemini-2.5-flash"
+    ),
+    "Legacy Support": (
+        "gemini-1.5-pro-latest", "gemini-1.5-flash-latest", "gemini-2.5-flash", "gemini-2.5-flash-lite"
+    )
+})
 
 
 def print_recommendations() -> None:
     """
     Menampilkan rekomendasi pemilihan model berdasarkan use case.
     """
-    print("\n" + "="*100)
-    print("💡 REKOMENDASI PEMILIHAN MODEL")
-    print("="*100)
+    lines = []
+    lines.append("\n" + "="*100)
+    lines.append("💡 REKOMENDASI PEMILIHAN MODEL")
+    lines.append("="*100)
     
-    recommendations = [
-        {
-            "use_case": "🎯 Kualitas Tertinggi (Budget Tidak Terbatas)",
-            "models": ["gemini-2.5-pro"],
-            "notes": "RPD rendah (100), cocok untuk dataset kecil premium"
-        },
-        {
-            "use_case": "⚖️ Balance Kualitas & Throughput (Recommended)",
-            "models": ["gemini-2.5-flash", "gemini-2.5-flash-preview"],
-            "notes": "RPD sedang (250), ideal untuk sebagian besar project"
-        },
-        {
-            "use_case": "🚀 High Volume Processing",
-            "models": ["gemini-2.5-flash-lite", "gemini-2.5-flash-lite-preview"],
-            "notes": "RPD tinggi (1000), optimal untuk dataset besar"
-        },
-        {
-            "use_case": "📄 Long Context Documents",
-            "models": ["gemini-2.0-flash"],
-            "notes": "TPM tinggi (1M), cocok untuk dokumen panjang"
-        },
-        {
-            "use_case": "⚡ Speed Critical Applications",
-            "models": ["gemini-2.0-flash-lite"],
-            "notes": "RPM tertinggi (30), real-time processing"
-        },
-        {
-            "use_case": "🔄 Migration dari 1.5.x",
-            "models": ["gemini-1.5-pro-latest", "gemini-1.5-flash-latest"],
-            "notes": "Backward compatibility, akan deprecated"
-        }
-    ]
-    
-    for rec in recommendations:
-        print(f"\n{rec['use_case']}")
+    for rec in _RECOMMENDATIONS:
+        lines.append(f"\n{rec['use_case']}")
         models_str = ', '.join(rec['models'])
-        print(f"   Models: {models_str}")
-        print(f"   Notes : {rec['notes']}")
+        lines.append(f"   Models: {models_str}")
+        lines.append(f"   Notes : {rec['notes']}")
+    
+    # Satu kali write ke stdout alih-alih print per baris
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def _probe_model(model: Mapping[str, Any]) -> Tuple[str, str, str]:
+    """
+    Menguji akses ke satu model dengan request count_tokens ringan.
+    
+    Returns:
+        Tuple[str, str, str]: (nama model, status, catatan)
+    """
+    import google.generativeai as genai
+    
+    try:
+        # Coba inisialisasi model
+        test_model = genai.GenerativeModel(model['name'])
+        
+        # Coba count tokens sebagai test ringan
+        test_response = test_model.count_tokens("test")
+        
+        status = "✅ Accessible"
+        notes = f"Token counted: {test_response.total_tokens}"
+        
+    except Exception as e:
+        status = "❌ Error"
+        error_msg = str(e)
+        if "not found" in error_msg.lower():
+            notes = "Model not found"
+        elif "permission" in error_msg.lower():
+            notes = "No permission"
+        elif "quota" in error_msg.lower():
+            notes = "Quota exceeded"
+        else:
+            notes = f"Error: {error_msg[:30]}..."
+    
+    return model['name'], status, notes
 
 
 def check_model_access(models: List[Dict[str, Any]]) -> None:
     """
     Memeriksa akses ke setiap model dan menampilkan status.
+    Request ke setiap model dijalankan paralel; hasil tetap dicetak berurutan.
     
     Args:
         models: Daftar model untuk dicek
@@ -309,30 +412,10 @@ def check_model_access(models: List[Dict[str, Any]]) -> None:
     print(f"\n{'Model Name':<35} {'Status':<15} {'Notes'}")
     print("-" * 80)
     
-    for model in models[:5]:  # Test hanya beberapa model untuk menghindari rate limit
-        try:
-            # Coba inisialisasi model
-            test_model = genai.GenerativeModel(model['name'])
-            
-            # Coba count tokens sebagai test ringan
-            test_response = test_model.count_tokens("test")
-            
-            status = "✅ Accessible"
-            notes = f"Token counted: {test_response.total_tokens}"
-            
-        except Exception as e:
-            status = "❌ Error"
-            error_msg = str(e)
-            if "not found" in error_msg.lower():
-                notes = "Model not found"
-            elif "permission" in error_msg.lower():
-                notes = "No permission"
-            elif "quota" in error_msg.lower():
-                notes = "Quota exceeded"
-            else:
-                notes = f"Error: {error_msg[:30]}..."
-        
-        print(f"{model['name']:<35} {status:<15} {notes}")
+    models_to_check = models[:5]  # Test hanya beberapa model untuk menghindari rate limit
+    with ThreadPoolExecutor(max_workers=len(models_to_check) or 1) as executor:
+        for name, status, notes in executor.map(_probe_model, models_to_check):
+            print(f"{name:<35} {status:<15} {notes}")
     
     print(f"\n💡 Tip: Untuk cek lengkap semua model, gunakan script terpisah untuk menghindari rate limit.")
 
@@ -341,42 +424,21 @@ def generate_fallback_config(models: List[Dict[str, Any]]) -> None:
     """
     Generate konfigurasi MODEL_FALLBACK_LIST yang optimal.
     """
-    print("\n" + "="*100)
-    print("🔧 KONFIGURASI MODEL FALLBACK YANG DISARANKAN")
-    print("="*100)
+    lines = []
+    lines.append("\n" + "="*100)
+    lines.append("🔧 KONFIGURASI MODEL FALLBACK YANG DISARANKAN")
+    lines.append("="*100)
+    
+    lines.append("\n📝 Copy salah satu konfigurasi berikut ke file .env Anda:\n")
     
-    # Filter hanya model yang aktif (bukan legacy)
-    active_models = [m for m in models if m.get('category') != 'Legacy models']
-    
-    # Sort berdasarkan kualitas vs throughput
-    sorted_models = sorted(active_models, key=lambda x: (
-        -x.get('rpd', 0),  # RPD tinggi lebih baik untuk fallback
-        x.get('rpm', 999)  # RPM rendah = kualitas lebih tinggi
-    ))
-    
-    # Buat beberapa konfigurasi untuk use case berbeda
-    configs = {
-        "Quality First (Recommended)": [
-            "gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.0-flash-lite"
-        ],
-        "Balanced": [
-            "gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.0-flash", "gemini-2.0-flash-lite"
-        ],
-        "High Volume": [
-            "gemini-2.5-flash-lite", "gemini-2.0-flash-lite", "gemini-2.0-flash", "gemini-2.5-flash"
-        ],
-        "Legacy Support": [
-            "gemini-1.5-pro-latest", "gemini-1.5-flash-latest", "gemini-2.5-flash", "gemini-2.5-flash-lite"
-        ]
-    }
-    
-    print("\n📝 Copy salah satu konfigurasi berikut ke file .env Anda:\n")
-    
-    for config_name, model_list in configs.items():
-        print(f"# {config_name}")
+    for config_name, model_list in _FALLBACK_CONFIGS.items():
+        lines.append(f"# {config_name}")
         models_str = ','.join(model_list)
-        print(f'MODEL_FALLBACK_LIST="{models_str}"')
-        print()
+        lines.append(f'MODEL_FALLBACK_LIST="{models_str}"')
+        lines.append("")
+    
+    # Satu kali write ke stdout alih-alih print per baris
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
@@ -392,6 +454,7 @@ Contoh penggunaan:
   python -m src.core_logic.list_models --show-details      # Detail lengkap setiap model
   python -m src.core_logic.list_models --check-access      # Cek akses ke model (perlu API key)
   python -m src.core_logic.list_models --generate-config   # Generate fallback config
+  python -m src.core_logic.list_models --show-api-count    # Jumlah model di akun (perlu API key)
         """
     )
     
@@ -419,6 +482,12 @@ Contoh penggunaan:
         help='Hanya tampilkan model dari API (bukan predefined list)'
     )
     
+    parser.add_argument(
+        '--show-api-count',
+        action='store_true',
+        help='Tampilkan jumlah model yang tersedia di akun Anda (memerlukan API key)'
+    )
+    
     args = parser.parse_args()
     
     print(f"🚀 Gemini Models Explorer - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -436,27 +505,31 @@ Contoh penggunaan:
     else:
         models = get_predefined_models()
         
-        # Tambah info dari API jika tersedia
-        if setup_gemini_api():
+        # Tambah info dari API hanya jika diminta (hemat satu request per run)
+        if args.show_api_count and setup_gemini_api():
             api_models = get_available_models_from_api()
             if api_models:
                 print(f"ℹ️  Informasi dari API: {len(api_models)} model tersedia di akun Anda.")
     
-    # Tampilkan daftar model
-    print_models_table(models, show_details=args.show_details)
+    # --generate-config saja tidak butuh tabel model maupun rekomendasi
+    config_only = args.generate_config and not (args.show_details or args.check_access or args.api_only)
+    
+    if not config_only:
+        print_models_table(models, show_details=args.show_details)
     
-    # Fitur tambahan
     if args.check_access:
         check_model_access(models)
     
     if args.generate_config:
         generate_fallback_config(models)
     
-    # Selalu tampilkan rekomendasi
-    if not args.api_only:
+    if not (args.api_only or config_only):
         print_recommendations()
     
-    print(f"\n✅ Selesai. Total {len(models)} model ditampilkan.")
+    if config_only:
+        print("\n✅ Selesai.")
+    else:
+        print(f"\n✅ Selesai. Total {len(models)} model ditampilkan.")
     print("💡 Gunakan --help untuk melihat opsi lainnya.")
 
 
@@ -1,53 +1,181 @@
 # src/core_logic/process.py
 
 import argparse
+import atexit
 import glob
 import os
+import queue
 import random
+import re
+import sys
 import time
 import logging
-from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any, Optional
 import json # <<< PERUBAHAN DIMULAI
 
+import numpy as np
+import google.ai.generativelanguage as glm
+from google.api_core import exceptions as google_exceptions
 import google.generativeai as genai
 from google.generativeai import types
 import pandas as pd
-from .env_manager import load_and_log_config
-from .request_tracker import log_request
+from .env_manager import (
+    load_and_log_config, BATCH_FORMATS, DEFAULT_GEMINI_RPM, DEFAULT_CONCURRENCY, DEFAULT_CHECKPOINT_EVERY,
+)
+from .request_tracker import log_request, get_request_tracker
+from .response_cache import ResponseCache, open_response_cache, DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES
 from .session_manager import start_session, get_current_session, end_current_session
 from tqdm import tqdm
 import threading
 
+# Engine parquet opsional untuk checkpoint; tanpa pyarrow checkpoint ditulis sebagai xlsx
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Reader xlsx opsional (Rust, streaming); tanpa python-calamine dipakai openpyxl read-only
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+# Writer xlsx opsional (streaming, constant_memory); tanpa xlsxwriter dipakai openpyxl
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Serializer JSON cepat opsional untuk data batch; fallback ke modul json standar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ... (semua fungsi dari setup_logging hingga open_dataset tetap sama) ...
 # ... Saya akan langsung ke fungsi yang diubah.                 ...
 
 LOG_DIR = "logs"
+# Rotasi file log harian jika melebihi ukuran ini
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Antrean record log (dipakai ulang antar pemanggilan setup_logging) dan thread
+# yang menuliskannya ke file dan konsol
+_LOG_QUEUE: queue.SimpleQueue = queue.SimpleQueue()
+_LOG_LISTENER: Optional[QueueListener] = None
 
 # Variabel global untuk state
 API_KEYS: List[str] = []
 current_key_index: int = 0
+# Melindungi rotasi current_key_index + genai.configure dari pemanggilan paralel
+_KEY_LOCK = threading.Lock()
 CONFIG: Dict[str, str] = {}
 MODEL_FALLBACK_LIST: List[str] = []
 current_model_index: int = 0
+KEY_POOL: Optional["KeyPool"] = None
+# Model untuk konfigurasi global genai (tanpa KeyPool), dibuat ulang saat key/model berganti
+_MODEL: Optional[genai.GenerativeModel] = None
+
+# Request paralel per API key (total worker = jumlah key * nilai ini)
+# Bisa diganti lewat CONCURRENCY di .env (total batch berjalan bersamaan)
+MAX_IN_FLIGHT_PER_KEY = 1
+# Lama key diistirahatkan setelah error kuota (batas kuota per menit)
+QUOTA_COOLDOWN_SECONDS = 60
+# Error kuota per key hanya dihitung selama jendela ini; model diganti jika semua key kena dalam jendela
+QUOTA_HIT_WINDOW_SECONDS = 5 * 60
+# Circuit breaker per (key, model): setelah sekian kegagalan beruntun key diistirahatkan lebih lama
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 30
+# Laju bucket dikali faktor ini setelah error kuota, dan naik kembali bertahap setelah sukses
+RATE_DECAY_FACTOR = 0.5
+RATE_RECOVERY_FACTOR = 1.1
+
+# Timeout request: 1.5x p95 response time sukses model tersebut, dibatasi MIN..MAX.
+# Sebelum ada cukup sampel dipakai MAX (batch besar bisa butuh 5-15 menit)
+REQUEST_TIMEOUT_MIN = 30.0
+REQUEST_TIMEOUT_MAX = 900.0
+REQUEST_TIMEOUT_P95_FACTOR = 1.5
+# Setelah DeadlineExceeded, timeout model tersebut minimal 2x timeout yang terlewati
+REQUEST_TIMEOUT_BACKOFF_FACTOR = 2.0
+
+# Context caching Gemini untuk bagian statis prompt (PROMPT_CACHE=true di .env).
+# Cache dibuat per (key, model) dan dibuat ulang sebelum TTL-nya habis
+PROMPT_CACHE_TTL_SECONDS = 3600
+PROMPT_CACHE_REFRESH_MARGIN = 300
+# Naikkan jika isi/format bagian statis prompt berubah
+PROMPT_CACHE_VERSION = 1
+
+# Backoff retry error API: base * 2^attempt dengan jitter +-RETRY_JITTER, maksimal RETRY_MAX_DELAY detik
+RETRY_BASE_DELAY = 1.0
+RETRY_JITTER = 0.5
+RETRY_MAX_DELAY = 30.0
+
+CHECKPOINT_SUFFIX = ".checkpoint.parquet"
+
+# Pola pemulihan JSON dari respons model yang tidak valid
+_MD_JSON_RE = re.compile(r'```(?:json)?\s*(\[.*?\])\s*```', re.DOTALL)
+_JSON_ARR_RE = re.compile(r'\[.*?\]', re.DOTALL)
+# Karakter struktural JSON yang diperhatikan _truncate_to_balanced
+_JSON_STRUCT_RE = re.compile(r'[\[\]{}"\\]')
+
+# Label untuk baris dengan teks kosong/NaN (tidak dikirim ke API)
+EMPTY_TEXT_LABEL = "TIDAK RELEVAN"
+EMPTY_TEXT_JUSTIFICATION = "Teks kosong"
+
+# Dtype kolom label/justifikasi: string berbasis Arrow jika pyarrow tersedia
+# (hemat memori dan ditulis ke parquet tanpa konversi object -> Arrow)
+RESULT_DTYPE = pd.StringDtype("pyarrow") if pyarrow is not None else pd.StringDtype()
 
 def setup_logging():
     """
     Mengonfigurasi logging untuk menyimpan ke file dan menampilkan di konsol.
+
+    Thread pemanggil hanya memasukkan record ke antrean (QueueHandler); penulisan
+    ke file dan konsol dilakukan satu thread QueueListener di belakang layar,
+    sehingga worker tidak saling menunggu lock handler.
     """
+    global _LOG_LISTENER
     os.makedirs(LOG_DIR, exist_ok=True)
     log_filename = datetime.now().strftime("labeling_%Y-%m-%d.log")
     log_filepath = os.path.join(LOG_DIR, log_filename)
 
-    # Konfigurasi dasar logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_filepath), # Simpan ke file
-            logging.StreamHandler()            # Tampilkan di terminal
-        ]
-    )
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [
+        RotatingFileHandler(log_filepath, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT), # Simpan ke file
+        logging.StreamHandler()            # Tampilkan di terminal
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Listener lama (pemanggilan ulang) dihentikan dulu agar antreannya terkuras
+    _stop_log_listener()
+    _LOG_LISTENER = QueueListener(_LOG_QUEUE, *handlers, respect_handler_level=True)
+    _LOG_LISTENER.start()
+
+    # Konfigurasi dasar logging; QueueHandler hanya menggabungkan pesan,
+    # format lengkap diterapkan oleh handler di listener
+    queue_handler = QueueHandler(_LOG_QUEUE)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+
+def _stop_log_listener() -> None:
+    """Menghentikan QueueListener (menulis sisa record di antrean) jika sedang berjalan."""
+    global _LOG_LISTENER
+    if _LOG_LISTENER is not None:
+        _LOG_LISTENER.stop()
+        for handler in _LOG_LISTENER.handlers:
+            handler.close()
+        _LOG_LISTENER = None
+
+# Pastikan sisa log tertulis saat interpreter berhenti
+atexit.register(_stop_log_listener)
 
 def initialize_labeling_process() -> None:
     """
@@ -58,13 +186,13 @@ def initialize_labeling_process() -> None:
     # Muat konfigurasi menggunakan fungsi terpusat dari env_manager
     settings, api_keys = load_and_log_config()
     
-    # Atur variabel global
-    CONFIG = settings
-    API_KEYS = api_keys
+    # Atur variabel global (salin karena hasil load_env_variables di-cache read-only)
+    CONFIG = dict(settings)
+    API_KEYS = list(api_keys)
     current_key_index = 0
     
     # Setup model fallback
-    MODEL_FALLBACK_LIST = CONFIG['MODEL_LIST']
+    MODEL_FALLBACK_LIST = list(CONFIG['MODEL_LIST'])
     current_model_index = 0
     CONFIG['MODEL_NAME'] = MODEL_FALLBACK_LIST[current_model_index]
 
@@ -74,6 +202,7 @@ def load_config_and_keys() -> None:
     Alias untuk initialize_labeling_process() untuk kompatibilitas dengan GUI.
     Memuat konfigurasi dan API keys dari environment variables.
     """
+    global _MODEL
     initialize_labeling_process()
     
     # Log model awal yang digunakan
@@ -82,14 +211,25 @@ def load_config_and_keys() -> None:
     
     # Konfigurasi Gemini dengan API key pertama
     genai.configure(api_key=API_KEYS[current_key_index])
+    _MODEL = None
 
-def rotate_api_key() -> None:
-    """Beralih ke API key berikutnya dalam daftar."""
-    global current_key_index
-    current_key_index = (current_key_index + 1) % len(API_KEYS)
-    new_key = API_KEYS[current_key_index]
-    genai.configure(api_key=new_key)
-    logging.warning(f"Merotasi ke API Key #{current_key_index + 1}...")
+def rotate_api_key() -> Tuple[int, str]:
+    """
+    Beralih ke API key berikutnya dalam daftar (aman dipanggil dari banyak thread).
+
+    Returns:
+        Tuple[int, str]: Index (0-based) dan API key yang sekarang aktif.
+    """
+    global current_key_index, _MODEL
+    with _KEY_LOCK:
+        current_key_index = (current_key_index + 1) % len(API_KEYS)
+        key_index = current_key_index
+        new_key = API_KEYS[key_index]
+        genai.configure(api_key=new_key)
+        # Model lama menyimpan client dari key sebelumnya
+        _MODEL = None
+    logging.warning(f"Merotasi ke API Key #{key_index + 1}...")
+    return key_index, new_key
 
 def rotate_model() -> bool:
     """
@@ -124,12 +264,328 @@ def rotate_model() -> bool:
         
         return False
 
+class TokenBucket:
+    """
+    Pembatas laju token bucket untuk satu API key.
+
+    Bucket terisi `rate` token per detik hingga `capacity`; satu request
+    mengambil satu token. Laju diturunkan setelah error kuota (`decay`) dan
+    dipulihkan bertahap ke laju awal setelah request sukses (`recover`).
+    Tidak thread-safe sendiri: dipanggil di bawah lock KeyPool.
+    """
+
+    def __init__(self, rpm: float):
+        self.base_rate = rpm / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(rpm, 1.0)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_time(self, now: float) -> float:
+        """Detik hingga satu token tersedia (0 jika bisa diambil sekarang)."""
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        """Mengambil satu token (panggil setelah `wait_time` bernilai 0)."""
+        self._refill(now)
+        self.tokens -= 1.0
+
+    def decay(self) -> None:
+        """Menurunkan laju setelah error kuota (429)."""
+        self.rate = max(self.rate * RATE_DECAY_FACTOR, self.base_rate / 8)
+        self.tokens = min(self.tokens, 0.0)
+
+    def recover(self) -> None:
+        """Menaikkan laju kembali menuju laju awal setelah request sukses."""
+        self.rate = min(self.rate * RATE_RECOVERY_FACTOR, self.base_rate)
+
+
+class KeyPool:
+    """
+    Pool API key untuk mengirim batch secara paralel.
+
+    Setiap key punya client sendiri (tanpa `genai.configure` global), jumlah
+    request yang sedang berjalan, dan waktu cooldown (`time.monotonic`).
+    Dispatcher memilih key yang tidak sedang cooldown dengan request aktif
+    paling sedikit, round-robin jika seri. Jika `rpm` > 0, setiap key juga
+    dibatasi TokenBucket sehingga request hanya ditahan saat kuota per menit
+    benar-benar akan terlampaui.
+
+    Kegagalan beruntun dihitung per (key, model) sebagai circuit breaker: setelah
+    CIRCUIT_FAILURE_THRESHOLD kegagalan, key diistirahatkan CIRCUIT_OPEN_SECONDS
+    (open). Request pertama setelahnya menjadi percobaan (half-open): sukses
+    menutup circuit, gagal langsung membukanya lagi.
+    """
+
+    def __init__(self, api_keys: List[str], max_in_flight_per_key: int = MAX_IN_FLIGHT_PER_KEY, rpm: float = DEFAULT_GEMINI_RPM):
+        self._keys = list(api_keys)
+        self._max_in_flight = max_in_flight_per_key
+        self._in_flight = [0] * len(self._keys)
+        self._cooldown_until = [0.0] * len(self._keys)
+        self._buckets = [TokenBucket(rpm) for _ in self._keys] if rpm > 0 else None
+        # model -> {index key: waktu monotonic error kuota terakhir}
+        self._quota_hits: Dict[str, Dict[int, float]] = {}
+        self._failures: Dict[Tuple[int, str], int] = {}
+        self._clients: Dict[int, Any] = {}
+        self._models: Dict[Tuple[int, str], genai.GenerativeModel] = {}
+        # (key, model, prefix) -> (model ber-context cache atau None jika gagal dibuat, batas pakai monotonic)
+        self._cached_models: Dict[Tuple[int, str, str], Tuple[Optional[genai.GenerativeModel], float]] = {}
+        self._cache_lock = threading.Lock()
+        # Lock per entri: pembuatan context cache (request jaringan) tidak menahan _cache_lock
+        self._cache_entry_locks: Dict[Tuple[int, str, str], threading.Lock] = {}
+        self._next_index = 0
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def capacity(self) -> int:
+        """Jumlah maksimum request yang boleh berjalan bersamaan."""
+        return len(self._keys) * self._max_in_flight
+
+    def acquire(self, stop_event: threading.Event) -> Optional[int]:
+        """
+        Mengambil index key yang siap dipakai; menunggu jika semua key sibuk
+        atau sedang cooldown.
+
+        Returns:
+            Optional[int]: Index key (0-based), atau None jika proses dihentikan.
+        """
+        key_count = len(self._keys)
+        with self._condition:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                buckets = self._buckets
+                ready = [
+                    i for i in range(key_count)
+                    if self._cooldown_until[i] <= now and self._in_flight[i] < self._max_in_flight
+                    and (buckets is None or buckets[i].wait_time(now) == 0.0)
+                ]
+                if ready:
+                    index = min(ready, key=lambda i: (self._in_flight[i], (i - self._next_index) % key_count))
+                    self._in_flight[index] += 1
+                    self._next_index = (index + 1) % key_count
+                    if buckets is not None:
+                        buckets[index].take(now)
+                    return index
+
+                # Tunggu key dilepas, cooldown berakhir, atau token terisi (maks 1 detik agar stop_event tetap dicek)
+                waits = [until - now for until in self._cooldown_until if until > now]
+                if buckets is not None:
+                    waits.extend(bucket.wait_time(now) for bucket in buckets)
+                waits = [w for w in waits if w > 0]
+                wait_time = min(waits) if waits else 1.0
+                self._condition.wait(timeout=min(max(wait_time, 0.05), 1.0))
+        return None
+
+    def release(self, index: int) -> None:
+        """Mengembalikan key ke pool setelah request selesai."""
+        with self._condition:
+            self._in_flight[index] -= 1
+            self._condition.notify_all()
+
+    def cooldown(self, index: int, seconds: float) -> None:
+        """Mengistirahatkan satu key selama `seconds` detik."""
+        with self._condition:
+            self._cooldown_until[index] = max(self._cooldown_until[index], time.monotonic() + seconds)
+        logging.warning("⏳ API Key #%d diistirahatkan %.1f detik.", index + 1, seconds)
+
+    def mark_quota_exhausted(self, index: int, model_name: str) -> bool:
+        """
+        Mencatat error kuota untuk key pada model tertentu dan mengistirahatkan key tersebut.
+
+        Returns:
+            bool: True jika semua key terkena batas kuota untuk model ini dalam
+            QUOTA_HIT_WINDOW_SECONDS terakhir.
+        """
+        self.cooldown(index, QUOTA_COOLDOWN_SECONDS)
+        now = time.monotonic()
+        with self._condition:
+            if self._buckets is not None:
+                self._buckets[index].decay()
+            hits = self._quota_hits.setdefault(model_name, {})
+            hits[index] = now
+            # Error kuota lama (batas per menit yang sudah pulih) tidak ikut dihitung
+            for key_index, hit_time in list(hits.items()):
+                if now - hit_time > QUOTA_HIT_WINDOW_SECONDS:
+                    del hits[key_index]
+            return len(hits) >= len(self._keys)
+
+    def record_success(self, index: int, model_name: str) -> None:
+        """
+        Mencatat request sukses: circuit (key, model) ditutup, catatan kuota key
+        untuk model ini dihapus, dan laju bucket dipulihkan bertahap.
+        """
+        with self._condition:
+            self._failures.pop((index, model_name), None)
+            self._quota_hits.get(model_name, {}).pop(index, None)
+            if self._buckets is not None:
+                self._buckets[index].recover()
+
+    def record_failure(self, index: int, model_name: str) -> bool:
+        """
+        Mencatat request gagal (selain kuota) untuk pasangan (key, model).
+
+        Returns:
+            bool: True jika circuit terbuka dan key diistirahatkan CIRCUIT_OPEN_SECONDS.
+        """
+        with self._condition:
+            failures = self._failures.get((index, model_name), 0) + 1
+            self._failures[(index, model_name)] = failures
+        if failures < CIRCUIT_FAILURE_THRESHOLD:
+            return False
+        logging.warning("🔌 Circuit terbuka untuk API Key #%d / %s setelah %d kegagalan beruntun.", index + 1, model_name, failures)
+        self.cooldown(index, CIRCUIT_OPEN_SECONDS)
+        return True
+
+    def clear_cooldowns(self) -> None:
+        """Mengaktifkan kembali semua key (misalnya setelah beralih model)."""
+        with self._condition:
+            self._cooldown_until = [0.0] * len(self._keys)
+            self._condition.notify_all()
+
+    def get_client(self, index: int) -> Any:
+        """Mengembalikan client GenerativeService milik key (dibuat sekali per key)."""
+        with self._condition:
+            client = self._clients.get(index)
+            if client is None:
+                client = glm.GenerativeServiceClient(client_options={"api_key": self._keys[index]})
+                self._clients[index] = client
+            return client
+
+    def get_model(self, index: int, model_name: str) -> genai.GenerativeModel:
+        """Mengembalikan GenerativeModel untuk pasangan (key, model), dibuat sekali lalu dipakai ulang."""
+        cache_key = (index, model_name)
+        model = self._models.get(cache_key)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            # GenerativeModel di genai 0.8 tidak menerima client per instance; isi client
+            # milik key ini agar request paralel tidak berebut konfigurasi global
+            model._client = self.get_client(index)
+            with self._condition:
+                model = self._models.setdefault(cache_key, model)
+        return model
+
+    def get_cached_model(self, index: int, model_name: str, prefix: str) -> Optional[genai.GenerativeModel]:
+        """
+        Mengembalikan GenerativeModel yang memakai context cache Gemini berisi `prefix`
+        untuk pasangan (key, model). Cache dibuat sekali lewat key tersebut dan dibuat
+        ulang menjelang kedaluwarsa.
+
+        Returns:
+            Optional[genai.GenerativeModel]: None jika cache tidak bisa dibuat (misalnya
+            prefix di bawah batas token minimum model); pemanggil memakai prompt penuh.
+        """
+        cache_key = (index, model_name, prefix)
+        with self._cache_lock:
+            entry = self._cached_models.get(cache_key)
+            if entry is not None and time.monotonic() < entry[1]:
+                return entry[0]
+            entry_lock = self._cache_entry_locks.setdefault(cache_key, threading.Lock())
+
+        # Hanya worker untuk pasangan yang sama yang menunggu pembuatan cache ini
+        with entry_lock:
+            with self._cache_lock:
+                entry = self._cached_models.get(cache_key)
+                if entry is not None and time.monotonic() < entry[1]:
+                    # Sudah dibuat worker lain selama menunggu
+                    return entry[0]
+            model, expires_at = self._create_cached_model(index, model_name, prefix)
+            with self._cache_lock:
+                self._cached_models[cache_key] = (model, expires_at)
+            return model
+
+    def _create_cached_model(self, index: int, model_name: str, prefix: str) -> Tuple[Optional[genai.GenerativeModel], float]:
+        """Membuat context cache lewat API; mengembalikan (model, waktu kedaluwarsa monotonic)."""
+        try:
+            cache_client = glm.CacheServiceClient(client_options={"api_key": self._keys[index]})
+            cached_content = cache_client.create_cached_content(
+                cached_content=glm.CachedContent(
+                    model=f"models/{model_name}",
+                    display_name=f"label-prefix-v{PROMPT_CACHE_VERSION}",
+                    contents=[glm.Content(role="user", parts=[glm.Part(text=prefix)])],
+                    ttl=timedelta(seconds=PROMPT_CACHE_TTL_SECONDS),
+                )
+            )
+        except Exception as e:
+            # Tidak dicoba lagi untuk pasangan ini selama proses berjalan
+            logging.warning("⚠️ Context cache prompt tidak bisa dibuat untuk API Key #%d / %s, memakai prompt penuh: %s", index + 1, model_name, e)
+            return None, float("inf")
+        # Sama dengan GenerativeModel.from_cached_content, tanpa request get lewat client global
+        model = genai.GenerativeModel(model_name)
+        model._cached_content = cached_content.name
+        model._client = self.get_client(index)
+        logging.info("🗄️ Context cache prompt dibuat untuk API Key #%d / %s: %s", index + 1, model_name, cached_content.name)
+        return model, time.monotonic() + PROMPT_CACHE_TTL_SECONDS - PROMPT_CACHE_REFRESH_MARGIN
+
+    def invalidate_cached_model(self, index: int, model_name: str, prefix: str) -> None:
+        """Membuang model ber-context cache (misalnya cache sudah dihapus di server)."""
+        with self._cache_lock:
+            self._cached_models.pop((index, model_name, prefix), None)
+
+
+def _retry_delay(attempt: int, multiplier: float = 1.0) -> float:
+    """Jeda sebelum retry ke-`attempt`: exponential backoff dengan jitter, dibatasi RETRY_MAX_DELAY."""
+    delay = RETRY_BASE_DELAY * (2 ** attempt) * multiplier
+    delay *= 1 + random.uniform(-RETRY_JITTER, RETRY_JITTER)
+    return min(delay, RETRY_MAX_DELAY)
+
+
+def _is_unrecoverable_error(error: Exception) -> bool:
+    """
+    True jika error dari API tidak akan hilang dengan retry (request tidak valid),
+    sehingga batch langsung dianggap gagal. API key yang tidak valid tidak termasuk:
+    batch masih bisa dicoba lewat key lain.
+    """
+    cause = error.__cause__ or error
+    return isinstance(cause, google_exceptions.InvalidArgument) and "api key" not in str(cause).lower()
+
+
+_MODEL_ROTATION_LOCK = threading.Lock()
+
+def _rotate_model_after_quota(failed_model: str, key_pool: KeyPool) -> bool:
+    """
+    Rotasi model yang aman dipanggil dari banyak worker: hanya worker pertama
+    yang melaporkan model habis yang benar-benar merotasi.
+
+    Returns:
+        bool: False jika semua model dalam fallback list sudah habis.
+    """
+    with _MODEL_ROTATION_LOCK:
+        if CONFIG['MODEL_NAME'] != failed_model:
+            # Worker lain sudah beralih ke model berikutnya
+            return True
+        if not rotate_model():
+            return False
+        key_pool.clear_cooldowns()
+        return True
+
+# Cache template prompt per path: (mtime_ns, isi yang sudah di-escape)
+_PROMPT_TEMPLATE_CACHE: Dict[str, Tuple[int, str]] = {}
+
 def load_prompt_template(filepath: str = "prompt_template.txt") -> str:
     """
     Memuat isi template prompt dari file eksternal dan memperbaiki format kurung kurawal.
+
+    Hasil di-cache per path dan hanya dibaca ulang jika mtime file berubah,
+    sehingga perubahan template tetap terpakai pada run berikutnya.
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
+        cache_key = os.path.abspath(filepath)
+        mtime_ns = os.stat(cache_key).st_mtime_ns
+        cached = _PROMPT_TEMPLATE_CACHE.get(cache_key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        with open(cache_key, 'r', encoding='utf-8') as f:
             content = f.read()
         
         # Escape semua kurung kurawal kecuali placeholder {data_json}
@@ -142,19 +598,131 @@ def load_prompt_template(filepath: str = "prompt_template.txt") -> str:
         # Kembalikan placeholder {data_json}
         content = content.replace('__DATA_JSON_PLACEHOLDER__', '{data_json}')
         
+        _PROMPT_TEMPLATE_CACHE[cache_key] = (mtime_ns, content)
         return content
     except FileNotFoundError:
         raise FileNotFoundError(f"❌ File prompt '{filepath}' tidak ditemukan.")
 
 # <<< PERUBAHAN DIMULAI
-def generate_from_gemini(prompt: str, generation_config: Dict, response_schema: Any = None) -> List[Dict[str, Any]]:
+def compile_prompt_template(prompt_template: str) -> Tuple[str, ...]:
+    """
+    Mem-parsing template (hasil `load_prompt_template`) sekali menjadi potongan
+    literal di sekitar placeholder {data_json}.
+
+    Prompt per batch cukup dibangun dengan `data_json.join(segments)`, tanpa
+    mem-parsing ulang format string setiap batch.
+    """
+    marker = "\x00DATA_JSON\x00"
+    return tuple(prompt_template.format(data_json=marker).split(marker))
+
+
+@lru_cache(maxsize=8)
+def _cached_generation_config(config_items: Tuple[Tuple[str, Any], ...]) -> Any:
+    """GenerationConfig untuk satu kombinasi setting (di-cache)."""
+    return genai.types.GenerationConfig(**dict(config_items))
+
+def _build_generation_config(generation_config: Any) -> Any:
+    """
+    Mengembalikan GenerationConfig untuk dict setting, dibangun sekali per kombinasi nilai.
+    GenerationConfig yang sudah jadi dikembalikan apa adanya.
+    """
+    if not isinstance(generation_config, dict):
+        return generation_config
+    try:
+        return _cached_generation_config(tuple(sorted(generation_config.items())))
+    except TypeError:
+        # Ada nilai yang tidak hashable (mis. list stop_sequences)
+        return genai.types.GenerationConfig(**generation_config)
+
+def _truncate_to_balanced(text: str) -> Optional[str]:
+    """
+    Memotong array JSON yang terpotong setelah objek lengkap terakhir lalu menutupnya.
+
+    Satu lintasan atas karakter struktural saja, dengan memperhatikan string
+    literal dan escape sehingga `]`/`}` di dalam teks tidak ikut dihitung.
+
+    Returns:
+        Optional[str]: JSON array yang seimbang, atau None jika tidak ada objek lengkap.
+    """
+    in_string = False
+    escaped_pos = -1
+    depth_sq = depth_cu = 0
+    last_good = 0
+    for match in _JSON_STRUCT_RE.finditer(text):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        ch = match.group()
+        if in_string:
+            if ch == '\\':
+                escaped_pos = pos + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '[':
+            depth_sq += 1
+        elif ch == ']':
+            depth_sq -= 1
+        elif ch == '{':
+            depth_cu += 1
+        elif ch == '}':
+            depth_cu -= 1
+            # Objek selesai langsung di dalam array terluar
+            if depth_sq == 1 and depth_cu == 0:
+                last_good = pos + 1
+    if last_good == 0:
+        return None
+    return text[:last_good] + ']'
+
+def _get_model(model_name: str, api_key_index: Optional[int]) -> genai.GenerativeModel:
+    """Mengembalikan instance GenerativeModel yang di-cache untuk model (dan key) yang diminta."""
+    global _MODEL
+    if api_key_index is not None and KEY_POOL is not None:
+        return KEY_POOL.get_model(api_key_index, model_name)
+    if _MODEL is None or _MODEL.model_name != f"models/{model_name}":
+        _MODEL = genai.GenerativeModel(model_name)
+    return _MODEL
+
+# Batas bawah timeout per model setelah request terkena DeadlineExceeded
+_REQUEST_TIMEOUT_FLOOR: Dict[str, float] = {}
+
+def _request_timeout(model_name: str) -> float:
+    """
+    Timeout adaptif untuk request ke model, dari p95 response time yang tercatat.
+
+    Tidak pernah di bawah batas yang dinaikkan oleh `_record_request_timeout`, agar
+    batch besar tidak terus-menerus timeout setelah p95 terbentuk dari batch kecil.
+    """
+    p95 = get_request_tracker().get_p95_response_time(model_name)
+    if p95 is None:
+        return REQUEST_TIMEOUT_MAX
+    timeout = max(REQUEST_TIMEOUT_MIN, REQUEST_TIMEOUT_P95_FACTOR * p95, _REQUEST_TIMEOUT_FLOOR.get(model_name, 0.0))
+    return min(timeout, REQUEST_TIMEOUT_MAX)
+
+def _record_request_timeout(model_name: str, request_timeout: float) -> None:
+    """Mencatat request yang melewati timeout: p95 ikut naik dan timeout berikutnya digandakan."""
+    get_request_tracker().record_timeout(model_name, request_timeout)
+    floor = min(REQUEST_TIMEOUT_BACKOFF_FACTOR * request_timeout, REQUEST_TIMEOUT_MAX)
+    _REQUEST_TIMEOUT_FLOOR[model_name] = max(_REQUEST_TIMEOUT_FLOOR.get(model_name, 0.0), floor)
+    logging.warning(f"⏱️ Request ke {model_name} melewati timeout {request_timeout:.0f} detik; timeout berikutnya minimal {floor:.0f} detik.")
+
+def generate_from_gemini(prompt: str, generation_config: Any, response_schema: Any = None, api_key_index: Optional[int] = None, model_name: Optional[str] = None, cached_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Mengirimkan prompt ke model Gemini dan menghasilkan keluaran JSON terstruktur.
     
     Args:
         prompt (str): Teks prompt yang akan dikirim ke model Gemini.
-        generation_config (Dict): Konfigurasi generasi model (misalnya max tokens, temperature, dsb.).
+        generation_config (Any): Konfigurasi generasi model (misalnya max tokens, temperature, dsb.),
+            berupa dict atau GenerationConfig yang sudah dibangun.
         response_schema (types.Schema): Skema JSON yang harus diikuti oleh output model.
+        api_key_index (Optional[int]): Index key di KEY_POOL yang dipakai untuk request ini.
+            Jika None, memakai konfigurasi global `genai.configure`.
+        model_name (Optional[str]): Model yang dipakai untuk request ini. Jika None,
+            memakai CONFIG['MODEL_NAME'] saat ini.
+        cached_prefix (Optional[str]): Awal prompt yang statis. Jika diberikan (dan
+            memakai KEY_POOL), bagian ini dikirim sebagai context cache Gemini dan
+            hanya sisa prompt yang dikirim per request.
 
     Returns:
         List[Dict[str, Any]]: Daftar dictionary hasil parsing dari output JSON model.
@@ -163,31 +731,41 @@ def generate_from_gemini(prompt: str, generation_config: Dict, response_schema:
         ValueError: Jika respons dari model tidak berisi konten atau JSON tidak valid.
         Exception: Jika terjadi error saat melakukan request API.
     """
-    model = genai.GenerativeModel(CONFIG['MODEL_NAME'])
+    if model_name is None:
+        model_name = CONFIG['MODEL_NAME']
+    model = None
+    if cached_prefix and api_key_index is not None and KEY_POOL is not None and prompt.startswith(cached_prefix):
+        model = KEY_POOL.get_cached_model(api_key_index, model_name, cached_prefix)
+        if model is not None:
+            prompt = prompt[len(cached_prefix):]
+    prompt_cached = model is not None
+    if model is None:
+        model = _get_model(model_name, api_key_index)
+    key_index_for_log = current_key_index if api_key_index is None else api_key_index
     
     # Record start time untuk tracking response time
     start_time = time.time()
     request_successful = False
     error_message = None
+    request_timeout = None
     
     try:
-        # Extended timeout for large batches (up to 250 items)
-        REQUEST_TIMEOUT = 900  # 15 minutes timeout for large batches
+        # Timeout adaptif: request yang macet dihentikan lalu dicoba ulang lewat key lain
+        request_timeout = _request_timeout(model_name)
         
-        logging.info(f"🚀 Mengirim prompt ke model {CONFIG['MODEL_NAME']}...")
-        logging.info(f"   └─ Request timeout: {REQUEST_TIMEOUT} seconds (15 minutes)")
-        logging.info(f"   └─ Prompt length: {len(prompt):,} characters")
+        logging.info(f"🚀 Mengirim prompt ke model {model_name} (API Key #{key_index_for_log + 1})...")
+        logging.debug("   └─ Request timeout: %.0f seconds", request_timeout)
+        logging.debug("   └─ Prompt length: %s characters", f"{len(prompt):,}")
         
         # Simplified generation config without response schema for compatibility
-        full_generation_config = genai.types.GenerationConfig(
-            **generation_config
-        )
+        full_generation_config = _build_generation_config(generation_config)
         
         # Track request start time for timeout detection
         request_start = time.time()
-        logging.info(f"   └─ Request started at: {time.strftime('%H:%M:%S')}")
         
-        response = model.generate_content(prompt, generation_config=full_generation_config)
+        response = model.generate_content(
+            prompt, generation_config=full_generation_config, request_options={"timeout": request_timeout}
+        )
         request_duration = time.time() - request_start
         
         logging.info(f"📥 Response diterima dalam {request_duration:.2f} seconds ({request_duration/60:.1f} minutes)")
@@ -204,16 +782,16 @@ def generate_from_gemini(prompt: str, generation_config: Dict, response_schema:
             logging.error(f"   └─ Candidates: {len(response.candidates) if response.candidates else 0}")
             raise ValueError(error_message)
         
-        # Log raw response untuk debugging
         raw_response_text = response.text.strip()
-        logging.info(f"📥 Raw response dari model (length: {len(raw_response_text)}):")
         
-        # Show preview of response
-        if len(raw_response_text) > 400:
-            logging.info(f"   └─ First 200 chars: {raw_response_text[:200]}...")
-            logging.info(f"   └─ Last 200 chars: ...{raw_response_text[-200:]}")
-        else:
-            logging.info(f"   └─ Full response: {raw_response_text}")
+        # Log raw response untuk debugging (hanya jika level DEBUG aktif; respons bisa sangat besar)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"📥 Raw response dari model (length: {len(raw_response_text)}):")
+            if len(raw_response_text) > 400:
+                logging.debug(f"   └─ First 200 chars: {raw_response_text[:200]}...")
+                logging.debug(f"   └─ Last 200 chars: ...{raw_response_text[-200:]}")
+            else:
+                logging.debug(f"   └─ Full response: {raw_response_text}")
         
         # Check if response is empty or whitespace only
         if not raw_response_text:
@@ -224,7 +802,7 @@ def generate_from_gemini(prompt: str, generation_config: Dict, response_schema:
         # Parsing JSON di sini untuk memastikan validitas sebelum dikembalikan
         try:
             result = json.loads(raw_response_text)
-            logging.info(f"✅ JSON parsing berhasil: {type(result)} dengan {len(result) if isinstance(result, list) else 'N/A'} items")
+            logging.debug("✅ JSON parsing berhasil: %s dengan %s items", type(result).__name__, len(result) if isinstance(result, list) else 'N/A')
         except json.JSONDecodeError as json_error:
             # Enhanced JSON error logging
             logging.error(f"🚫 JSON Decode Error Detail:")
@@ -233,26 +811,21 @@ def generate_from_gemini(prompt: str, generation_config: Dict, response_schema:
             logging.error(f"   └─ Raw text repr: {repr(raw_response_text[:500])}")
             
             # Try to find and extract JSON from response (markdown wrapped or truncated)
-            import re
-            
             # Pattern 1: Extract from markdown code blocks
-            markdown_pattern = r'```(?:json)?\s*(\[.*?\])\s*```'
-            markdown_matches = re.findall(markdown_pattern, raw_response_text, re.DOTALL)
+            markdown_matches = _MD_JSON_RE.findall(raw_response_text)
             
             if markdown_matches:
                 logging.info(f"   └─ Found JSON in markdown blocks, trying to parse...")
                 try:
                     result = json.loads(markdown_matches[0])
                     logging.info(f"✅ Successfully parsed markdown JSON with {len(result)} items")
-                    logging.info(f"🎯 Returning parsed result to calling function...")
                     request_successful = True
                     return result
                 except json.JSONDecodeError:
                     logging.error(f"   └─ Markdown JSON also invalid")
             
             # Pattern 2: Extract JSON arrays (even if truncated)
-            json_pattern = r'\[.*?\]'
-            json_matches = re.findall(json_pattern, raw_response_text, re.DOTALL)
+            json_matches = _JSON_ARR_RE.findall(raw_response_text)
             
             if json_matches:
                 logging.info(f"   └─ Found {len(json_matches)} potential JSON arrays, trying to parse...")
@@ -270,35 +843,18 @@ def generate_from_gemini(prompt: str, generation_config: Dict, response_schema:
             if raw_response_text.strip().startswith('['):
                 logging.info(f"   └─ Attempting to fix truncated JSON...")
                 
-                # Count open and close brackets
-                open_brackets = raw_response_text.count('[')
-                close_brackets = raw_response_text.count(']')
-                open_braces = raw_response_text.count('{')
-                close_braces = raw_response_text.count('}')
-                
-                # Try to complete the JSON
-                fixed_json = raw_response_text.strip()
-                
-                # Add missing closing braces
-                missing_braces = open_braces - close_braces
-                if missing_braces > 0:
-                    # Remove incomplete object/entry at the end
-                    last_complete_brace = fixed_json.rfind('}')
-                    if last_complete_brace > 0:
-                        fixed_json = fixed_json[:last_complete_brace + 1]
-                
-                # Add missing closing bracket
-                missing_brackets = open_brackets - close_brackets
-                if missing_brackets > 0:
-                    fixed_json += ']' * missing_brackets
+                # Potong setelah objek lengkap terakhir lalu tutup array-nya
+                fixed_json = _truncate_to_balanced(raw_response_text)
                 
                 try:
+                    if fixed_json is None:
+                        raise ValueError("tidak ada objek lengkap")
                     result = json.loads(fixed_json)
                     logging.info(f"✅ Successfully parsed fixed JSON with {len(result)} items")
                     logging.warning(f"   ⚠️  JSON was truncated but recovered {len(result)} items")
                     request_successful = True
                     return result
-                except json.JSONDecodeError:
+                except ValueError:
                     logging.error(f"   └─ Could not fix truncated JSON")
             
             # If all parsing attempts fail, raise original error
@@ -313,37 +869,109 @@ def generate_from_gemini(prompt: str, generation_config: Dict, response_schema:
         logging.error(f"🚫 JSON parsing gagal setelah semua upaya")
         raise ValueError(error_message) from e
     except Exception as e:
+        if prompt_cached and isinstance(e, google_exceptions.NotFound):
+            # Context cache sudah kedaluwarsa/dihapus di server; dibuat ulang pada percobaan berikutnya
+            KEY_POOL.invalidate_cached_model(api_key_index, model_name, cached_prefix)
+        if request_timeout is not None and isinstance(e, google_exceptions.DeadlineExceeded):
+            _record_request_timeout(model_name, request_timeout)
         error_message = f"Error saat request API: {e}"
         logging.error(f"🚫 API request error: {error_message}")
         raise Exception(error_message) from e
     finally:
         # Record request metrics
         response_time = time.time() - start_time
-        logging.info(f"🔄 Recording request metrics (response_time: {response_time:.2f}s)...")
         
         request_id = log_request(
-            api_key_index=current_key_index + 1,  # 1-based indexing for display
-            model_name=CONFIG['MODEL_NAME'],
+            api_key_index=key_index_for_log + 1,  # 1-based indexing for display
+            model_name=model_name,
             success=request_successful,
             response_time=response_time,
             error_message=error_message
         )
-        logging.info(f"✅ Request logged with ID: {request_id}")
-        
-        # Force save untuk persistence setiap request labeling
-        logging.info(f"🔄 Starting session stats save...")
-        from .request_tracker import get_request_tracker
-        tracker = get_request_tracker()
-        logging.info(f"📊 Got request tracker instance")
+        logging.debug("✅ Request logged with ID: %s (response_time: %.2fs)", request_id, response_time)
         
-        tracker._save_session_stats()
-        logging.info(f"✅ Session stats saved successfully")
-        logging.info(f"🎯 generate_from_gemini() finally block completed")
+        # Simpan statistik ke disk secara berkala (bukan setiap request);
+        # penyimpanan terakhir dilakukan di akhir label_dataset
+        get_request_tracker().maybe_save()
 # <<< PERUBAHAN SELESAI
 
+def get_excel_engine() -> str:
+    """
+    Engine pembaca xlsx tercepat yang tersedia.
+
+    calamine jika python-calamine terpasang; jika tidak, openpyxl (pandas
+    membukanya dalam mode read_only sehingga sheet dibaca per baris, bukan
+    dimuat seluruhnya sebagai DOM).
+    """
+    return "calamine" if python_calamine is not None else "openpyxl"
+
+
+def read_excel_file(filepath: str) -> pd.DataFrame:
+    """Membaca file xlsx dengan reader tercepat yang tersedia."""
+    return pd.read_excel(filepath, engine=get_excel_engine())
+
+
+# Subdirektori (di dalam direktori dataset) untuk salinan parquet dataset sumber
+DATASET_CACHE_DIR = ".cache"
+
+def get_dataset_cache_path(source_path: str) -> str:
+    """Path cache parquet untuk file dataset sumber `source_path`."""
+    dataset_dir, filename = os.path.split(source_path)
+    return os.path.join(dataset_dir, DATASET_CACHE_DIR, f"{filename}.parquet")
+
+# Key metadata parquet cache yang menyimpan identitas file sumber (ukuran dan mtime)
+DATASET_CACHE_SOURCE_KEY = b"source_stat"
+
+def _dataset_source_stat(source_path: str) -> bytes:
+    """Identitas file sumber untuk validasi cache: ukuran dan mtime (ns)."""
+    stat = os.stat(source_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+def _read_dataset_cached(source_path: str, reader) -> pd.DataFrame:
+    """
+    Membaca dataset lewat cache parquet jika cache dibuat dari file sumber yang sama.
+
+    Ukuran dan mtime file sumber disimpan di metadata parquet; cache hanya dipakai
+    jika keduanya persis sama (file pengganti dengan mtime lebih lama, mis. hasil
+    `cp -p` atau ekstrak arsip, tetap terdeteksi). Jika tidak, dataset dibaca
+    dengan `reader` lalu disimpan sebagai parquet (zstd) secara atomik. Tanpa
+    pyarrow, file sumber selalu dibaca langsung.
+    """
+    if pyarrow is None:
+        return reader(source_path)
+
+    cache_path = get_dataset_cache_path(source_path)
+    source_stat = _dataset_source_stat(source_path)
+    if os.path.exists(cache_path):
+        try:
+            metadata = pyarrow.parquet.read_schema(cache_path).metadata or {}
+        except (OSError, pyarrow.ArrowException):
+            metadata = {}
+        if metadata.get(DATASET_CACHE_SOURCE_KEY) == source_stat:
+            logging.info(f"⚡ Memakai cache dataset: '{cache_path}'")
+            return pd.read_parquet(cache_path)
+
+    df = reader(source_path)
+    tmp_filepath = f"{cache_path}.part"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), DATASET_CACHE_SOURCE_KEY: source_stat})
+        pyarrow.parquet.write_table(table, tmp_filepath, compression="zstd")
+        os.replace(tmp_filepath, cache_path)
+    except (OSError, pyarrow.ArrowException, TypeError, ValueError) as e:
+        # Cache hanya optimasi; dataset tetap dipakai walau cache gagal ditulis
+        logging.warning(f"⚠️ Cache dataset tidak bisa ditulis ({e}).")
+    return df
+
+
 def open_dataset(dataset_dir: str, base_filename: str) -> Tuple[pd.DataFrame, str]:
     """
     Membuka dataset dari direktori dengan prioritas file CSV, kemudian XLSX.
+
+    Pembacaan berikutnya memakai salinan parquet di `<dataset_dir>/.cache/`
+    selama file sumber tidak berubah.
     """
     csv_path = os.path.join(dataset_dir, f"{base_filename}.csv")
     xlsx_path = os.path.join(dataset_dir, f"{base_filename}.xlsx")
@@ -351,16 +979,205 @@ def open_dataset(dataset_dir: str, base_filename: str) -> Tuple[pd.DataFrame, st
     try:
         if os.path.exists(csv_path):
             logging.info(f"Ditemukan file CSV: '{csv_path}'")
-            return pd.read_csv(csv_path), csv_path
+            return _read_dataset_cached(csv_path, pd.read_csv), csv_path
         elif os.path.exists(xlsx_path):
             logging.info(f"Ditemukan file XLSX: '{xlsx_path}'")
-            return pd.read_excel(xlsx_path), xlsx_path
+            return _read_dataset_cached(xlsx_path, read_excel_file), xlsx_path
         else:
             raise FileNotFoundError(f"Dataset tidak ditemukan. Tidak ada file '{csv_path}' atau '{xlsx_path}'.")
     except Exception as e:
         raise Exception(f"Gagal membaca file dataset: {e}") from e
 
 
+# Batas panjang teks satu sel Excel
+EXCEL_MAX_CELL_CHARS = 32767
+
+def _clip_excel_text(working_df: pd.DataFrame) -> pd.DataFrame:
+    """Memotong kolom string (label/justifikasi) yang melebihi batas sel Excel; disalin hanya jika perlu."""
+    too_long = [
+        col for col in working_df.columns
+        if isinstance(working_df[col].dtype, pd.StringDtype) and (working_df[col].str.len() > EXCEL_MAX_CELL_CHARS).any()
+    ]
+    if not too_long:
+        return working_df
+    logging.warning(f"⚠️ Teks di kolom {too_long} dipotong ke {EXCEL_MAX_CELL_CHARS} karakter (batas sel Excel).")
+    return working_df.assign(**{col: working_df[col].str.slice(0, EXCEL_MAX_CELL_CHARS) for col in too_long})
+
+
+def _write_xlsx_streaming(working_df: pd.DataFrame, filepath: str) -> None:
+    """
+    Menulis DataFrame ke xlsx baris demi baris dengan xlsxwriter mode constant_memory:
+    setiap baris langsung di-flush ke disk, tanpa membangun seluruh workbook di memori.
+
+    `DataFrame.to_excel` menulis sel per kolom sehingga tidak bisa dipakai dengan
+    constant_memory (baris yang sudah di-flush tidak bisa ditulis lagi).
+    """
+    workbook = xlsxwriter.Workbook(filepath, {
+        'constant_memory': True,
+        # Teks ditulis apa adanya, bukan ditafsirkan sebagai formula/URL
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'nan_inf_to_errors': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True,
+    })
+    try:
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [str(col) for col in working_df.columns])
+        # Nilai kosong (NaN/NA/NaT) ditulis sebagai sel kosong
+        values = working_df.astype(object).where(working_df.notna(), None)
+        for row_index, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_index, 0, row)
+    finally:
+        workbook.close()
+
+
+def save_output_file(working_df: pd.DataFrame, filepath: str) -> None:
+    """
+    Menyimpan working DataFrame ke file output secara atomik.
+
+    Data ditulis dulu ke file sementara `<filepath>.part`, lalu dipindahkan ke
+    target dengan `os.replace` sehingga file output tidak pernah setengah tertulis
+    jika proses terhenti di tengah penyimpanan. Memakai xlsxwriter (streaming)
+    jika terpasang; jika tidak, openpyxl.
+    """
+    working_df = _clip_excel_text(working_df)
+    tmp_filepath = f"{filepath}.part"
+    if xlsxwriter is not None:
+        _write_xlsx_streaming(working_df, tmp_filepath)
+    else:
+        # Tulis via file handle: pandas menolak ekstensi '.part' jika diberi path
+        with open(tmp_filepath, 'wb') as f:
+            working_df.to_excel(f, index=False, engine="openpyxl")
+    os.replace(tmp_filepath, filepath)
+
+
+def get_checkpoint_path(filepath: str) -> str:
+    """Path checkpoint parquet untuk file output xlsx `filepath`."""
+    return os.path.splitext(filepath)[0] + CHECKPOINT_SUFFIX
+
+
+def save_checkpoint(working_df: pd.DataFrame, filepath: str) -> None:
+    """
+    Menyimpan progress setelah setiap batch.
+
+    Jika BATCH_FMT="parquet" (default, dibaca dari .env lewat CONFIG) dan pyarrow
+    tersedia, progress ditulis ke file checkpoint parquet (zstd) di samping file
+    output, jauh lebih cepat daripada menulis ulang seluruh xlsx. File xlsx final
+    ditulis oleh `save_output_file` di akhir session. Tanpa pyarrow, langsung
+    menulis xlsx seperti biasa.
+    """
+    if CONFIG.get("BATCH_FMT", BATCH_FORMATS[0]) != "parquet" or pyarrow is None:
+        save_output_file(working_df, filepath)
+        return
+
+    checkpoint_path = get_checkpoint_path(filepath)
+    tmp_filepath = f"{checkpoint_path}.part"
+    try:
+        working_df.to_parquet(tmp_filepath, compression="zstd", index=False)
+    except (pyarrow.ArrowException, TypeError, ValueError) as e:
+        # Mis. kolom object berisi tipe campuran yang tidak bisa dipetakan ke Arrow
+        logging.warning(f"⚠️ Checkpoint parquet gagal ({e}), menyimpan sebagai xlsx.")
+        save_output_file(working_df, filepath)
+        return
+    os.replace(tmp_filepath, checkpoint_path)
+
+
+class CheckpointWriter:
+    """
+    Menulis checkpoint di thread latar belakang agar dispatch batch berikutnya
+    tidak menunggu disk.
+
+    Satu thread penulis menjaga urutan penulisan (semua menulis ke file `.part`
+    yang sama). Snapshot yang masih antre dibatalkan jika ada snapshot lebih
+    baru, karena checkpoint terakhir sudah memuat semua progress.
+
+    Snapshot (salinan penuh working_df) hanya dibuat setiap `every` kali submit;
+    progress yang belum tertulis ditulis saat `close(flush=True)`.
+    """
+
+    def __init__(self, filepath: str, every: int = 1):
+        self._filepath = filepath
+        self._every = max(1, every)
+        self._unsaved = 0
+        self._latest: Optional[pd.DataFrame] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self._pending: Optional[Future] = None
+
+    def submit(self, working_df: pd.DataFrame) -> None:
+        """Mencatat progress working_df; checkpoint dijadwalkan setiap `every` kali."""
+        self._unsaved += 1
+        if self._unsaved < self._every:
+            self._latest = working_df
+            return
+        self._unsaved = 0
+        self._latest = None
+        # Salin agar thread utama bisa terus mengubah working_df selama penulisan
+        snapshot = working_df.copy()
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self._executor.submit(self._write, snapshot)
+
+    def _write(self, snapshot: pd.DataFrame) -> None:
+        try:
+            save_checkpoint(snapshot, self._filepath)
+        except Exception as e:
+            logging.error(f"❌ Gagal menyimpan checkpoint: {e}")
+
+    def close(self, flush: bool = True) -> None:
+        """
+        Menulis progress yang belum masuk checkpoint (jika `flush`) lalu menunggu
+        semua penulisan selesai. Aman dipanggil lebih dari sekali.
+        """
+        if flush and self._latest is not None:
+            # Thread utama sudah berhenti mengubah working_df; tidak perlu disalin
+            if self._pending is not None:
+                self._pending.cancel()
+            self._pending = self._executor.submit(self._write, self._latest)
+        self._latest = None
+        self._unsaved = 0
+        self._executor.shutdown(wait=True)
+
+
+def _finalize_output(working_df: pd.DataFrame, checkpoint_writer: CheckpointWriter, filepath: str) -> None:
+    """
+    Menulis xlsx final lalu menghapus checkpoint yang sudah tidak diperlukan.
+
+    Jika penulisan xlsx gagal (disk penuh, file sedang dibuka di Excel, dll.),
+    progress terakhir disimpan ke checkpoint agar bisa di-resume, lalu error
+    diteruskan.
+    """
+    # Checkpoint yang masih ditulis harus selesai dulu; progress yang belum
+    # di-checkpoint langsung masuk xlsx final
+    checkpoint_writer.close(flush=False)
+    try:
+        save_output_file(working_df, filepath)
+    except Exception:
+        try:
+            save_checkpoint(working_df, filepath)
+            logging.warning("💾 Progress terakhir disimpan ke checkpoint karena file output gagal ditulis.")
+        except Exception as e:
+            logging.error(f"❌ Gagal menyimpan checkpoint: {e}")
+        raise
+    checkpoint_path = get_checkpoint_path(filepath)
+    if os.path.exists(checkpoint_path):
+        # xlsx final sudah memuat semua progress; checkpoint tidak diperlukan lagi
+        os.remove(checkpoint_path)
+
+
+def _read_working_file(filepath: str) -> pd.DataFrame:
+    """
+    Membaca file output untuk resume, memakai checkpoint parquet jika lebih baru
+    dari file xlsx (proses sebelumnya berhenti sebelum xlsx final ditulis).
+    """
+    checkpoint_path = get_checkpoint_path(filepath)
+    if pyarrow is not None and os.path.exists(checkpoint_path):
+        if not os.path.exists(filepath) or os.path.getmtime(checkpoint_path) >= os.path.getmtime(filepath):
+            logging.info(f"📂 Melanjutkan dari checkpoint: {os.path.basename(checkpoint_path)}")
+            return pd.read_parquet(checkpoint_path)
+    return read_excel_file(filepath)
+
+
 # <<< PERUBAHAN DIMULAI: Seluruh fungsi label_dataset dioptimalkan untuk resume
 def create_or_resume_output_file(df_master: pd.DataFrame, base_name: str, output_dir: str) -> tuple[str, pd.DataFrame, dict]:
     """
@@ -380,15 +1197,20 @@ def create_or_resume_output_file(df_master: pd.DataFrame, base_name: str, output
     filepath = os.path.join(output_dir, filename)
     
     # Cek apakah ada file existing dengan pattern yang sama
-    existing_files = []
+    # (checkpoint tanpa xlsx berarti session sebelumnya terhenti sebelum penyimpanan final)
+    existing_files = set()
     if os.path.exists(output_dir):
         for f in os.listdir(output_dir):
-            if f.startswith(f"{base_name}_labeled_") and f.endswith(".xlsx"):
-                existing_files.append(f)
+            if not f.startswith(f"{base_name}_labeled_"):
+                continue
+            if f.endswith(".xlsx"):
+                existing_files.add(f)
+            elif f.endswith(CHECKPOINT_SUFFIX) and pyarrow is not None:
+                existing_files.add(f[:-len(CHECKPOINT_SUFFIX)] + ".xlsx")
     
     if existing_files:
         # Gunakan file yang paling baru
-        existing_files.sort(reverse=True)
+        existing_files = sorted(existing_files, reverse=True)
         latest_file = existing_files[0]
         filepath = os.path.join(output_dir, latest_file)
         
@@ -396,7 +1218,7 @@ def create_or_resume_output_file(df_master: pd.DataFrame, base_name: str, output
         
         try:
             # Load existing progress
-            existing_df = pd.read_excel(filepath)
+            existing_df = _read_working_file(filepath)
             logging.info(f"✅ Loaded existing file dengan {len(existing_df)} baris")
             
             # Ensure required columns exist
@@ -426,10 +1248,17 @@ def create_or_resume_output_file(df_master: pd.DataFrame, base_name: str, output
             working_df["justifikasi"] = None
         if 'id' not in working_df.columns:
             working_df['id'] = range(len(working_df))
-    
+
+    # Kolom hasil dari Excel yang masih kosong terbaca sebagai float64 (NaN);
+    # simpan sebagai string dtype agar bisa diisi label/justifikasi tanpa cast ke object
+    for col in ("label", "justifikasi"):
+        if col not in working_df.columns:
+            working_df[col] = None
+        working_df[col] = working_df[col].astype(RESULT_DTYPE)
+
     # Calculate progress
     total_rows = len(working_df)
-    labeled_rows = working_df['label'].notna().sum()
+    labeled_rows = int(working_df['label'].count())
     unlabeled_rows = total_rows - labeled_rows
     percent_complete = (labeled_rows / total_rows * 100) if total_rows > 0 else 0
     
@@ -453,15 +1282,18 @@ def find_optimal_batches(df: pd.DataFrame, batch_size: int) -> List[tuple]:
         List[tuple]: List of (start_idx, end_idx) untuk batch yang perlu diproses
     """
     total_rows = len(df)
+    if total_rows == 0:
+        return []
+
+    # Jumlah baris berlabel per batch dalam satu lintasan
+    labeled_mask = df['label'].notna().to_numpy()
+    starts = np.arange(0, total_rows, batch_size)
+    ends = np.minimum(starts + batch_size, total_rows)
+    labeled_counts = np.add.reduceat(labeled_mask.astype(np.int32), starts)
+
     batches_to_process = []
-    
-    for start in range(0, total_rows, batch_size):
-        end = min(start + batch_size, total_rows)
-        batch_slice = df.iloc[start:end]
-        
-        # Hitung status labeling dalam batch ini
-        labeled_count = batch_slice['label'].notna().sum()
-        total_in_batch = len(batch_slice)
+    for start, end, labeled_count in zip(starts.tolist(), ends.tolist(), labeled_counts.tolist()):
+        total_in_batch = end - start
         
         # Skip batch yang sudah complete
         if labeled_count == total_in_batch:
@@ -480,11 +1312,471 @@ def find_optimal_batches(df: pd.DataFrame, batch_size: int) -> List[tuple]:
     return batches_to_process
 
 
+def propagate_duplicate_labels(working_df: pd.DataFrame, text_column_name: str) -> int:
+    """
+    Menyalin label/justifikasi ke baris belum berlabel yang teksnya identik
+    dengan baris yang sudah dilabeli, sehingga teks duplikat (retweet, template)
+    tidak dikirim ulang ke API.
+
+    Returns:
+        int: Jumlah baris yang terisi dari duplikat
+    """
+    labeled = working_df['label'].notna()
+    if not labeled.any() or labeled.all():
+        return 0
+
+    source = (
+        working_df.loc[labeled, [text_column_name, 'label', 'justifikasi']]
+        .drop_duplicates(subset=text_column_name, keep='first')
+        .set_index(text_column_name)
+    )
+    targets = ~labeled & working_df[text_column_name].isin(source.index)
+    filled_count = int(targets.sum())
+    if filled_count:
+        target_texts = working_df.loc[targets, text_column_name]
+        working_df.loc[targets, 'label'] = source['label'].reindex(target_texts).to_numpy()
+        working_df.loc[targets, 'justifikasi'] = source['justifikasi'].reindex(target_texts).to_numpy()
+    return filled_count
+
+
+class DuplicateIndex:
+    """
+    Peta teks -> posisi baris yang dibangun sekali per session (`pd.factorize`),
+    sehingga label hasil satu batch bisa disebarkan ke baris dengan teks identik
+    tanpa memindai ulang seluruh working_df setiap batch.
+
+    Posisi bersifat positional (iloc); urutan baris working_df tidak boleh berubah
+    selama session.
+    """
+
+    def __init__(self, texts: pd.Series):
+        # Teks kosong (NaN) mendapat kode -1 dan tidak pernah dianggap duplikat
+        self._codes = pd.factorize(texts)[0]
+        valid_codes = self._codes[self._codes >= 0]
+        self._counts = np.bincount(valid_codes, minlength=int(valid_codes.max()) + 1 if len(valid_codes) else 0)
+        # Posisi baris dikelompokkan per kode; kelompok kode c ada di _order[_starts[c]:_starts[c + 1]]
+        self._order = np.argsort(self._codes, kind='stable')[len(self._codes) - len(valid_codes):]
+        self._starts = np.concatenate(([0], np.cumsum(self._counts)))
+
+    def propagate(self, working_df: pd.DataFrame, positions: np.ndarray) -> int:
+        """
+        Menyalin label/justifikasi dari `positions` (baru dilabeli) ke baris belum
+        berlabel yang teksnya identik.
+
+        Returns:
+            int: Jumlah baris yang terisi dari duplikat
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        codes = self._codes[positions]
+        # Hanya teks yang muncul lebih dari sekali di dataset
+        has_duplicates = codes >= 0
+        has_duplicates[has_duplicates] = self._counts[codes[has_duplicates]] > 1
+        codes, first = np.unique(codes[has_duplicates], return_index=True)
+        if not len(codes):
+            return 0
+        sources = positions[has_duplicates][first]
+
+        groups = [self._order[self._starts[code]:self._starts[code + 1]] for code in codes]
+        targets = np.concatenate(groups)
+        target_sources = np.repeat(sources, [len(group) for group in groups])
+
+        label_col = working_df.columns.get_loc('label')
+        justification_col = working_df.columns.get_loc('justifikasi')
+        unlabeled = working_df.iloc[targets, label_col].isna().to_numpy()
+        source_labeled = working_df.iloc[target_sources, label_col].notna().to_numpy()
+        fill = unlabeled & source_labeled
+        targets, target_sources = targets[fill], target_sources[fill]
+        if len(targets):
+            working_df.iloc[targets, label_col] = working_df.iloc[target_sources, label_col].to_numpy()
+            working_df.iloc[targets, justification_col] = working_df.iloc[target_sources, justification_col].to_numpy()
+        return int(len(targets))
+
+
+def _record_labeled(progress_info: Dict[str, Any], count: int) -> None:
+    """
+    Menambah jumlah baris berlabel di `progress_info` (dari create_or_resume_output_file),
+    sehingga progress tidak perlu dihitung ulang dari seluruh kolom label setiap batch.
+    """
+    if count:
+        progress_info['labeled'] += count
+        progress_info['unlabeled'] = progress_info['total'] - progress_info['labeled']
+        progress_info['percent'] = (progress_info['labeled'] / progress_info['total'] * 100) if progress_info['total'] > 0 else 0
+
+
+def _prepare_batch(working_df: pd.DataFrame, start: int, end: int, text_column_name: str, session_manager, progress_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Menyiapkan satu batch di thread utama: mengisi teks kosong, membuang duplikat,
+    dan membangun JSON yang akan dikirim.
+
+    Returns:
+        Optional[Dict[str, Any]]: Job batch untuk worker, atau None jika batch
+        selesai tanpa perlu request API.
+    """
+    batch_id = f"batch_{start+1}_{end}"
+    logging.info(f"📋 Processing batch {start+1}-{end} (ID: {batch_id})")
+
+    # <<< SESSION TRACKING: Start batch tracking >>>
+    batch_info = session_manager.start_batch(batch_id, start, end)
+
+    label_col = working_df.columns.get_loc('label')
+    batch_row_total = end - start
+
+    # Posisi baris yang belum berlabel, dibaca dari view kolom label (tanpa menyalin slice batch)
+    unlabeled_positions = start + np.flatnonzero(working_df.iloc[start:end, label_col].isna().to_numpy())
+
+    # If no rows need labeling, batch is complete
+    if not len(unlabeled_positions):
+        logging.info(f"✅ Batch {start+1}-{end} sudah lengkap ({batch_row_total} items). Melewati...")
+        session_manager.end_batch(
+            batch_info, success=True, items_processed=batch_row_total, items_failed=0
+        )
+        return None
+
+    # Hanya kolom yang dikirim ke API yang diambil
+    unlabeled_in_batch = working_df.iloc[unlabeled_positions, working_df.columns.get_indexer(['id', text_column_name])]
+
+    # Baris dengan teks kosong/NaN langsung dilabeli tanpa request ke API
+    batch_texts = unlabeled_in_batch[text_column_name]
+    empty_mask = (batch_texts.isna() | (batch_texts.astype(str).str.strip() == "")).to_numpy()
+    empty_count = int(empty_mask.sum())
+    if empty_count:
+        empty_positions = unlabeled_positions[empty_mask]
+        working_df.iloc[empty_positions, label_col] = EMPTY_TEXT_LABEL
+        working_df.iloc[empty_positions, working_df.columns.get_loc('justifikasi')] = EMPTY_TEXT_JUSTIFICATION
+        logging.info(f"⏭️ Batch {start+1}-{end}: {empty_count} baris teks kosong dilabeli '{EMPTY_TEXT_LABEL}' tanpa request API.")
+        _record_labeled(progress_info, empty_count)
+        unlabeled_in_batch = unlabeled_in_batch[~empty_mask]
+        unlabeled_positions = unlabeled_positions[~empty_mask]
+
+        if unlabeled_in_batch.empty:
+            session_manager.end_batch(
+                batch_info, success=True, items_processed=empty_count, items_failed=0
+            )
+            return None
+
+    # Teks duplikat dalam batch cukup dikirim sekali; hasilnya disebar setelah batch valid
+    unique_mask = ~unlabeled_in_batch[text_column_name].duplicated().to_numpy()
+    duplicate_count = int((~unique_mask).sum())
+    if duplicate_count:
+        unlabeled_in_batch = unlabeled_in_batch[unique_mask]
+        unlabeled_positions = unlabeled_positions[unique_mask]
+        logging.info(f"♻️ Batch {start+1}-{end}: {duplicate_count} teks duplikat tidak dikirim ulang ke API.")
+
+    logging.info(f"🔄 Batch {start+1}-{end}: {len(unlabeled_in_batch)}/{batch_row_total} items perlu dilabeli.")
+
+    # Prepare data for processing (only unlabeled items)
+    data_to_process = unlabeled_in_batch.to_dict(orient='records')
+
+    return {
+        'start': start,
+        'end': end,
+        'batch_info': batch_info,
+        # Posisi baris dan id yang dikirim, untuk menulis hasil langsung ke working_df
+        'positions': unlabeled_positions,
+        'ids': unlabeled_in_batch['id'].to_numpy(),
+        'item_count': len(unlabeled_in_batch),
+        'items_skipped': empty_count + duplicate_count,
+        'data_json': _dumps_batch_json(data_to_process),
+    }
+
+
+def _dumps_batch_json(data_to_process: List[Dict[str, Any]]) -> str:
+    """
+    Serialisasi data batch ke JSON ringkas (tanpa indent) untuk disisipkan ke prompt.
+
+    Indentasi hanya menambah token input tanpa menambah informasi bagi model.
+    """
+    if orjson is not None:
+        return orjson.dumps(data_to_process, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(data_to_process, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _validate_batch_output(output_list: Any, expected_ids: np.ndarray, allowed_labels: frozenset) -> Tuple[bool, str, Optional[pd.DataFrame]]:
+    """
+    Memvalidasi output satu batch dalam satu lintasan: tipe, jumlah, kolom, id, dan label.
+
+    Args:
+        output_list: Hasil parsing JSON dari model.
+        expected_ids: Id yang dikirim dalam batch (urutan penulisan ke working_df).
+        allowed_labels: Label yang diperbolehkan (sudah di-casefold); kosong berarti tidak dicek.
+
+    Returns:
+        Tuple[bool, str, Optional[pd.DataFrame]]: (valid, alasan jika tidak valid,
+        DataFrame hasil ber-index id yang sudah diurutkan sesuai `expected_ids`).
+    """
+    if not isinstance(output_list, list):
+        return False, f"Output bukan list ({type(output_list).__name__})", None
+    if len(output_list) != len(expected_ids):
+        return False, f"Jumlah output JSON tidak sesuai. Diharapkan {len(expected_ids)}, diterima {len(output_list)}", None
+
+    if not all(isinstance(item, dict) for item in output_list):
+        return False, "Output berisi item yang bukan objek JSON", None
+
+    present_columns = set().union(*output_list)
+    missing_columns = [col for col in ('id', 'label', 'justifikasi') if col not in present_columns]
+    if missing_columns:
+        return False, f"Kolom tidak ada di output: {', '.join(missing_columns)}", None
+
+    # Skema sudah diketahui: kolom dibangun langsung dengan dtype hasil (RESULT_DTYPE),
+    # tanpa inferensi tipe DataFrame dari list of dict
+    try:
+        output_df = pd.DataFrame(
+            {
+                'label': pd.array([item.get('label') for item in output_list], dtype=RESULT_DTYPE),
+                'justifikasi': pd.array([item.get('justifikasi') for item in output_list], dtype=RESULT_DTYPE),
+            },
+            index=pd.Index([item.get('id') for item in output_list], name='id'),
+        )
+    except (TypeError, ValueError) as e:
+        return False, f"Output tidak bisa dibaca sebagai tabel: {e}", None
+
+    output_df = output_df[~output_df.index.duplicated(keep='last')].reindex(pd.Index(expected_ids))
+    labels = output_df['label']
+    missing_mask = labels.isna().to_numpy()
+    if missing_mask.any():
+        return False, f"{int(missing_mask.sum())} id tidak ada di output atau labelnya kosong", None
+
+    if allowed_labels:
+        # Normalisasi dijalankan vektor oleh pandas
+        invalid_mask = ~labels.str.strip().str.casefold().isin(allowed_labels).to_numpy()
+        if invalid_mask.any():
+            invalid_examples = sorted(set(labels[invalid_mask].astype(str)))[:5]
+            return False, f"{int(invalid_mask.sum())} label di luar daftar yang diizinkan: {invalid_examples}", None
+
+    return True, "", output_df
+
+
+def _label_batch_worker(job: Dict[str, Any], prompt_segments: Tuple[str, ...], generation_config: Any, max_retry: int, allowed_labels: frozenset, key_pool: KeyPool, stop_event: threading.Event, response_cache: Optional[ResponseCache] = None, prompt_cache: bool = False) -> Dict[str, Any]:
+    """
+    Mengirim satu batch ke Gemini dengan retry (berjalan di thread worker).
+
+    Setiap percobaan mengambil key dari pool. Error kuota mengistirahatkan key
+    tersebut (model baru dicoba hanya jika semua key habis untuk model aktif);
+    error lain mengistirahatkan key dengan exponential backoff sehingga batch
+    dicoba ulang lewat key lain. Worker tidak menyentuh working_df.
+
+    Jika `response_cache` diberikan, output tervalidasi untuk prompt dan model
+    yang sama diambil dari cache tanpa request API, dan output baru yang valid
+    disimpan ke cache.
+
+    Jika `prompt_cache` True, bagian template sebelum data dikirim sebagai
+    context cache Gemini (lihat KeyPool.get_cached_model).
+
+    Returns:
+        Dict[str, Any]: Hasil batch dengan 'status' salah satu dari
+        'valid', 'failed', 'token_limit', atau 'cancelled'.
+    """
+    start, end = job['start'], job['end']
+    expected_count = job['item_count']
+    prompt = job['data_json'].join(prompt_segments)
+    cached_prefix = prompt_segments[0] if prompt_cache else None
+    result = {
+        'status': 'failed',
+        'output_list': None,
+        'output_df': None,
+        'error_message': None,
+        'model_used': CONFIG.get('MODEL_NAME'),
+        'api_key_index': None,
+    }
+
+    if response_cache is not None:
+        cached_output = response_cache.get(ResponseCache.make_key(result['model_used'], generation_config, prompt))
+        if cached_output is not None:
+            is_valid, _, output_df = _validate_batch_output(cached_output, job['ids'], allowed_labels)
+            if is_valid:
+                logging.info("💾 Batch %d-%d diambil dari cache respons (tanpa request API).", start + 1, end)
+                result.update(status='valid', output_list=cached_output, output_df=output_df)
+                return result
+
+    attempt = 0
+    while attempt < max_retry:
+        attempt += 1
+        if stop_event.is_set():
+            result['status'] = 'cancelled'
+            return result
+
+        key_index = key_pool.acquire(stop_event)
+        if key_index is None:
+            result['status'] = 'cancelled'
+            return result
+
+        model_name = CONFIG['MODEL_NAME']
+        result['model_used'] = model_name
+        result['api_key_index'] = key_index + 1
+
+        try:
+            logging.info("🔄 Mengirim request ke API untuk batch %d-%d (attempt %d/%d, API Key #%d)...", start + 1, end, attempt, max_retry, key_index + 1)
+            if expected_count > 100:
+                logging.info("⚡ Processing large batch (%d items) - this may take 5-15 minutes...", expected_count)
+            output_list = generate_from_gemini(prompt, generation_config, api_key_index=key_index, model_name=model_name, cached_prefix=cached_prefix)
+            key_pool.record_success(key_index, model_name)
+        except Exception as e:
+            # Traceback lengkap hanya saat DEBUG; saat error beruntun cukup pesan error-nya
+            logging.error("Error pada API Key #%d saat memproses batch %d-%d: %s", key_index + 1, start + 1, end, e,
+                          exc_info=logging.getLogger().isEnabledFor(logging.DEBUG))
+            error_string = str(e).lower()
+            if "max_tokens" in error_string or "finish reason: max_tokens" in error_string:
+                logging.error("⛔️ ERROR TOKEN LIMIT! Menyimpan batch %d-%d dengan hasil parsial...", start + 1, end)
+                result['status'] = 'token_limit'
+                result['error_message'] = "Token limit exceeded"
+                return result
+            if any(keyword in error_string for keyword in ["quota", "limit", "permission denied"]):
+                result['error_message'] = f"Batas kuota pada API Key #{key_index + 1}"
+                # Model baru dicoba hanya jika semua key sudah kena kuota untuk model ini
+                if key_pool.mark_quota_exhausted(key_index, model_name):
+                    if not _rotate_model_after_quota(model_name, key_pool):
+                        # Semua model habis, hentikan proses
+                        logging.error("🛑 Menghentikan proses karena semua model mencapai batas kuota.")
+                        result['error_message'] = "Semua model mencapai batas kuota"
+                        stop_event.set()
+                        return result
+                    logging.info("🔄 Mencoba ulang batch %d-%d dengan model baru...", start + 1, end)
+                # Error kuota tidak menghabiskan jatah retry: key sudah diistirahatkan dan
+                # batch menunggu key lain (atau model baru)
+                attempt -= 1
+                continue
+
+            if _is_unrecoverable_error(e):
+                logging.error("⛔️ Request batch %d-%d tidak valid, tidak dicoba ulang: %s", start + 1, end, e)
+                result['error_message'] = f"Request tidak valid: {e}"
+                return result
+
+            # Error lain: key ini diistirahatkan (exponential backoff + jitter), batch dicoba lewat key lain
+            # Batch besar menunggu lebih lama agar tidak membebani API
+            backoff_time = _retry_delay(attempt, multiplier=2 if expected_count > 100 else 1)
+            if not key_pool.record_failure(key_index, model_name):
+                key_pool.cooldown(key_index, backoff_time)
+            result['error_message'] = f"API error pada attempt {attempt}"
+            continue
+        finally:
+            key_pool.release(key_index)
+
+        # <<< PERUBAHAN 2: Validasi jumlah, id, dan label dalam satu lintasan >>>
+        is_valid, reason, output_df = _validate_batch_output(output_list, job['ids'], allowed_labels)
+        if not is_valid:
+            logging.warning("❌ Output batch %d-%d tidak valid: %s. Mencoba lagi...", start + 1, end, reason)
+            result['error_message'] = f"{reason} (attempt {attempt})"
+            stop_event.wait(3)
+            continue
+
+        logging.info("✅ Batch %d-%d berhasil diproses dan divalidasi!", start + 1, end)
+        if response_cache is not None:
+            response_cache.set(ResponseCache.make_key(model_name, generation_config, prompt), output_list)
+        result['status'] = 'valid'
+        result['output_list'] = output_list
+        result['output_df'] = output_df
+        return result
+
+    return result
+
+
+def _log_output_preview(output_list: List[Dict[str, Any]], start: int, end: int) -> None:
+    """
+    Mencatat jumlah output model; preview maksimal 3 item pertama hanya
+    diformat jika level DEBUG aktif.
+    """
+    logging.info("🤖 Model Response untuk batch %d-%d: %d hasil", start + 1, end, len(output_list))
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    for i, item in enumerate(output_list[:3]):
+        if isinstance(item, dict):
+            justifikasi_preview = str(item.get('justifikasi', 'N/A'))[:50]
+            logging.debug(f"      └─ Item {i+1}: ID={item.get('id', 'N/A')}, Label={item.get('label', 'N/A')}")
+            logging.debug(f"         Justifikasi preview: '{justifikasi_preview}...'")
+        else:
+            logging.debug(f"      Item {i+1}: {str(item)[:100]}...")
+    if len(output_list) > 3:
+        logging.debug(f"   📝 ... dan {len(output_list) - 3} item lainnya")
+
+
+def _commit_batch_result(working_df: pd.DataFrame, checkpoint_writer: CheckpointWriter, text_column_name: str, session_manager, job: Dict[str, Any], result: Dict[str, Any], progress_info: Dict[str, Any], duplicate_index: Optional[DuplicateIndex] = None) -> None:
+    """
+    Menulis hasil satu batch ke working_df, menjadwalkan checkpoint, memperbarui
+    `progress_info`, dan mencatat batch ke session. Hanya dipanggil dari thread utama.
+
+    Dengan `duplicate_index`, label hanya disebarkan dari teks di batch ini;
+    tanpa itu seluruh working_df dipindai ulang.
+    """
+    start, end = job['start'], job['end']
+    status = result['status']
+
+    if status == 'valid':
+        _log_output_preview(result['output_list'], start, end)
+        # Sudah divalidasi worker: ber-index id dan berurutan sesuai job['ids']
+        output_df = result['output_df']
+
+        label_distribution = None
+        if not output_df.empty:
+            # Tampilkan statistik label sebelum menyimpan
+            if 'label' in output_df.columns:
+                # Counter atas list kecil lebih ringan daripada value_counts, dan hasilnya int Python (JSON-friendly)
+                label_distribution = dict(Counter(output_df['label'].tolist()))
+                logging.info(f"   📈 Distribusi label: {label_distribution}")
+
+            # Update working_df dengan hasil dari batch (single file approach)
+            # Ditulis langsung ke posisi baris yang dikirim
+            positions = job['positions']
+            working_df.iloc[positions, working_df.columns.get_loc('label')] = output_df['label'].astype(RESULT_DTYPE).array
+            working_df.iloc[positions, working_df.columns.get_loc('justifikasi')] = output_df['justifikasi'].astype(RESULT_DTYPE).array
+
+            # Sebarkan hasil ke baris lain (di batch ini maupun batch berikutnya) dengan teks identik
+            if duplicate_index is not None:
+                duplicate_filled = duplicate_index.propagate(working_df, positions)
+            else:
+                duplicate_filled = propagate_duplicate_labels(working_df, text_column_name)
+            if duplicate_filled:
+                logging.info(f"   ♻️ {duplicate_filled} baris duplikat ikut terlabeli.")
+            # Posisi yang dikirim semuanya belum berlabel, jadi tiap hasil menambah satu baris berlabel
+            _record_labeled(progress_info, len(positions) + duplicate_filled)
+
+        session_kwargs = dict(
+            success=True,
+            items_processed=job['item_count'] + job['items_skipped'],
+            items_failed=0,
+            label_distribution=label_distribution,
+        )
+        progress_note = "completed"
+    elif status == 'token_limit':
+        session_kwargs = dict(
+            success=False, items_processed=0, items_failed=job['item_count'],
+            error_message="Token limit exceeded",
+        )
+        progress_note = "token limit"
+    else:
+        if status == 'cancelled':
+            logging.warning(f"⏹️ Batch {start+1}-{end} dibatalkan sebelum selesai.")
+            error_message = "Dibatalkan"
+        else:
+            logging.warning(f"Gagal memproses {job['item_count']} baris dalam batch {start+1}-{end} setelah semua percobaan.")
+            error_message = result['error_message'] or "Gagal setelah semua percobaan"
+        session_kwargs = dict(
+            success=False, items_processed=0, items_failed=job['item_count'],
+            error_message=error_message,
+        )
+        progress_note = "batch failed"
+
+    # Checkpoint progress di thread latar setiap beberapa batch (parquet jika tersedia;
+    # xlsx final ditulis di akhir session)
+    checkpoint_writer.submit(working_df)
+
+    logging.info(f"   📊 Progress: {progress_info['labeled']}/{progress_info['total']} ({progress_info['percent']:.1f}%) - {progress_note}")
+
+    session_manager.end_batch(
+        job['batch_info'],
+        model_used=result['model_used'],
+        api_key_index=result['api_key_index'],
+        **session_kwargs
+    )
+
+
 def label_dataset(df_master: pd.DataFrame, base_name: str, batch_size: int, max_retry: int, generation_config: Dict, text_column_name: str, allowed_labels: List[str], stop_event: threading.Event) -> None:
     """
     Mengorkestrasi proses pelabelan dengan single file output dan resume capability.
     Membuat copy dataset ke results folder, lalu update in-place.
+    Batch dikirim paralel ke Gemini lewat KeyPool (satu worker per API key).
     """
+    global KEY_POOL
+
     output_dir_for_project = os.path.join(CONFIG['OUTPUT_DIR'], base_name)
     os.makedirs(output_dir_for_project, exist_ok=True)
     
@@ -508,7 +1800,20 @@ def label_dataset(df_master: pd.DataFrame, base_name: str, batch_size: int, max_
             session_manager.end_session(progress_info['total'])
         return
 
-    prompt_template = load_prompt_template()
+    prompt_segments = compile_prompt_template(load_prompt_template())
+    # GenerationConfig dibangun sekali per run lalu dipakai semua batch dan retry
+    generation_config = _build_generation_config(generation_config)
+    # Label dari model dicocokkan tanpa membedakan huruf besar/kecil
+    allowed_label_set = frozenset(label.strip().casefold() for label in (allowed_labels or []) if label.strip())
+
+    # Isi baris yang teksnya sudah pernah dilabeli (resume) sebelum memilih batch
+    duplicate_filled = propagate_duplicate_labels(working_df, text_column_name)
+    if duplicate_filled:
+        logging.info(f"♻️ {duplicate_filled} baris duplikat diisi dari teks yang sudah dilabeli.")
+        _record_labeled(progress_info, duplicate_filled)
+        save_checkpoint(working_df, output_filepath)
+    # Peta teks -> posisi baris untuk menyebarkan hasil tiap batch ke duplikatnya
+    duplicate_index = DuplicateIndex(working_df[text_column_name])
     
     # <<< OPTIMAL BATCH PROCESSING: Find batches to process >>>
     batches_to_process = find_optimal_batches(working_df, batch_size)
@@ -524,367 +1829,76 @@ def label_dataset(df_master: pd.DataFrame, base_name: str, batch_size: int, max_
 
     total_rows = len(working_df)
     
-    # End of function - will be replaced with new implementation
-    logging.info("⚠️ Function implementation incomplete - needs update")
-    session_manager.end_session(total_rows)
-    
-    # Check if all batches are already processed by scanning existing batch files
-    total_batches_expected = (total_rows + batch_size - 1) // batch_size  # Ceiling division
-    existing_batches = 0
-    completed_batches = 0
-    
-    for i in range(0, total_rows, batch_size):
-        end = min(i + batch_size, total_rows)
-        batch_filename = f"{base_name}_batch{i+1:03d}_{end:03d}.xlsx"
-        batch_filepath = os.path.join(output_dir_for_project, batch_filename)
-        
-        if os.path.exists(batch_filepath):
-            existing_batches += 1
-            # Check if this batch is fully labeled
-            try:
-                batch_df = pd.read_excel(batch_filepath)
-                if batch_df['label'].notna().all():  # All rows have labels
-                    completed_batches += 1
-            except:
-                pass  # If can't read file, consider it incomplete
-    
-    if existing_batches == total_batches_expected and completed_batches == total_batches_expected:
-        logging.warning(f"🎉 SEMUA BATCH SUDAH SELESAI! Ditemukan {completed_batches}/{total_batches_expected} batch lengkap.")
-        logging.info("💡 Hapus file batch yang ingin diproses ulang, atau ubah nama proyek untuk memulai baru.")
-        if session_manager:
-            session_manager.end_session(total_rows)
-        return
-
     logging.info("🏁 Memulai proses pelabelan per-batch dengan penyimpanan real-time...")
-    
-    try:
-        for start in tqdm(range(0, total_rows, batch_size), desc="Overall Progress", unit="batch"):
-            logging.info(f"🔄 Starting batch loop iteration: {start+1}-{min(start + batch_size, total_rows)}")
-            
-            if stop_event.is_set():
-                logging.warning("Proses dihentikan oleh pengguna.")
-                break  
-
-            end = min(start + batch_size, total_rows)
-            batch_id = f"batch_{start+1}_{end}"
-            
-            logging.info(f"📋 Processing batch {start+1}-{end} (ID: {batch_id})")
 
-            # <<< SESSION TRACKING: Start batch tracking >>>
-            batch_info = session_manager.start_batch(batch_id, start, end)
-            logging.info(f"🚀 Session tracking started for batch {batch_id}")
+    # Batch dikirim paralel lewat pool API key; working_df hanya diubah di thread utama
+    # Setting opsional sudah divalidasi oleh env_manager.load_env_variables
+    gemini_rpm = CONFIG.get("GEMINI_RPM", DEFAULT_GEMINI_RPM)
+    # CONCURRENCY dibagi rata ke semua key (dibulatkan ke atas)
+    concurrency = CONFIG.get("CONCURRENCY", DEFAULT_CONCURRENCY)
+    max_in_flight_per_key = -(-concurrency // len(API_KEYS)) if concurrency > 0 else MAX_IN_FLIGHT_PER_KEY
+    KEY_POOL = KeyPool(API_KEYS, max_in_flight_per_key=max_in_flight_per_key, rpm=gemini_rpm)
+    max_workers = max(1, min(KEY_POOL.capacity, concurrency) if concurrency > 0 else KEY_POOL.capacity)
+    logging.info(f"🔑 {len(KEY_POOL)} API key aktif, maksimal {max_workers} batch berjalan bersamaan.")
+    if gemini_rpm > 0:
+        logging.info(f"⏱️ Rate limit: {gemini_rpm:g} request/menit per API key.")
 
-            # Get batch slice from working dataframe (single file approach)
-            batch_slice = working_df.iloc[start:end].copy()
-
-            # Find rows that need labeling (label is NaN/None)
-            unlabeled_in_batch = batch_slice[batch_slice['label'].isna()]
-
-            # If no rows need labeling, batch is complete
-            if unlabeled_in_batch.empty:
-                logging.info(f"✅ Batch {start+1}-{end} sudah lengkap ({len(batch_slice)} items). Melewati...")
-                session_manager.end_batch(
-                    batch_info, success=True, items_processed=len(batch_slice), items_failed=0
-                )
-                continue
-            
-            logging.info(f"🔄 Batch {start+1}-{end}: {len(unlabeled_in_batch)}/{len(batch_slice)} items perlu dilabeli.")
-
-            # Prepare data for processing (only unlabeled items)
-            data_to_process = unlabeled_in_batch[['id', text_column_name]].to_dict(orient='records')
-            data_json_string = json.dumps(data_to_process, indent=2)
+    batch_starts = list(range(0, total_rows, batch_size))
+    # Progress bar hanya di terminal interaktif (GUI/log file tidak perlu redraw tqdm)
+    progress_disabled = sys.stderr is None or not sys.stderr.isatty()
+    progress_bar = tqdm(total=len(batch_starts), desc="Overall Progress", unit="batch",
+                        mininterval=0.5, dynamic_ncols=True, disable=progress_disabled)
+    checkpoint_writer = CheckpointWriter(output_filepath, every=CONFIG.get("CHECKPOINT_EVERY", DEFAULT_CHECKPOINT_EVERY))
+    response_cache = open_response_cache(
+        CONFIG['OUTPUT_DIR'],
+        enabled=CONFIG.get("RESPONSE_CACHE", True),
+        ttl_seconds=CONFIG.get("CACHE_TTL", DEFAULT_TTL_SECONDS),
+        max_entries=CONFIG.get("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    )
+    # Context caching Gemini untuk bagian statis prompt (opsional, ada biaya penyimpanan)
+    prompt_cache = CONFIG.get("PROMPT_CACHE", False)
+    if prompt_cache:
+        logging.info("🗄️ Context caching prompt aktif (TTL %d detik).", PROMPT_CACHE_TTL_SECONDS)
 
-            is_batch_valid = False
-            attempts = 0
-            token_limit_error_detected = False
-            batch_error_message = None
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini-batch") as executor:
+            pending = {}
+            next_batch = 0
+            while True:
+                # Isi slot kosong; batch berikutnya baru disiapkan saat ada slot agar
+                # duplikat yang terlabeli di batch sebelumnya tidak dikirim ulang
+                while len(pending) < max_workers and next_batch < len(batch_starts) and not stop_event.is_set():
+                    start = batch_starts[next_batch]
+                    next_batch += 1
+                    job = _prepare_batch(working_df, start, min(start + batch_size, total_rows), text_column_name, session_manager, progress_info)
+                    if job is None:
+                        progress_bar.update(1)
+                        continue
+                    future = executor.submit(
+                        _label_batch_worker, job, prompt_segments, generation_config, max_retry, allowed_label_set, KEY_POOL, stop_event, response_cache, prompt_cache
+                    )
+                    pending[future] = job
 
-            while not is_batch_valid and attempts < max_retry:
-                attempts += 1
-                prompt = prompt_template.format(data_json=data_json_string)
-            
-            try:
-                logging.info(f"🔄 Mengirim request ke API untuk batch {start+1}-{end}...")
-                logging.info(f"   └─ Batch size: {len(unlabeled_in_batch)} items")
-                logging.info(f"   └─ Large batch optimization: {'ENABLED' if len(unlabeled_in_batch) > 100 else 'DISABLED'}")
-                
-                # Add extra logging for large batches (>100 items)
-                if len(unlabeled_in_batch) > 100:
-                    logging.info(f"⚡ Processing large batch ({len(unlabeled_in_batch)} items) - this may take 5-15 minutes...")
-                    logging.info(f"   └─ Expected processing time: {len(unlabeled_in_batch) * 2}+ seconds")
-                    logging.info(f"   └─ Please be patient, do not interrupt...")
-                
-                output_list = generate_from_gemini(prompt, generation_config)
-                logging.info(f"🎯 generate_from_gemini() completed, received result")
-                logging.info(f"📥 Response diterima dari API - processing hasil...")
-                logging.info(f"🔄 Checking hasil type dan format...")
-                
-                # Immediate type and basic validation
-                logging.info(f"   └─ Result type: {type(output_list)}")
-                logging.info(f"   └─ Result is list: {isinstance(output_list, list)}")
-                if isinstance(output_list, list):
-                    logging.info(f"   └─ List length: {len(output_list)}")
-                else:
-                    logging.warning(f"   └─ Unexpected type, content preview: {str(output_list)[:200]}...")
-
-                # <<< PERUBAHAN BARU: Tampilkan output model untuk monitoring >>>
-                logging.info(f"🤖 Starting model response analysis...")
-                logging.info(f"🤖 Model Response untuk batch {start+1}-{end}:")
-                logging.info(f"   📊 Jumlah hasil: {len(output_list) if isinstance(output_list, list) else 'Bukan list'}")
-                logging.info(f"   📋 Tipe data: {type(output_list)}")
-                
-                # Show processing efficiency for large batches
-                if len(unlabeled_in_batch) > 100 and isinstance(output_list, list):
-                    success_rate = (len(output_list) / len(unlabeled_in_batch)) * 100
-                    logging.info(f"   📈 Success rate: {success_rate:.1f}% ({len(output_list)}/{len(unlabeled_in_batch)} items)")
-                
-                logging.info(f"🔍 Starting preview generation...")
-                
-                # Tampilkan preview output (maksimal 3 item pertama)
-                logging.info(f"🔄 Checking if output_list is valid for preview...")
-                logging.info(f"   └─ isinstance(output_list, list): {isinstance(output_list, list)}")
-                logging.info(f"   └─ len(output_list) > 0: {len(output_list) > 0 if isinstance(output_list, list) else 'N/A'}")
-                
-                if isinstance(output_list, list) and len(output_list) > 0:
-                    preview_count = min(3, len(output_list))
-                    logging.info(f"   📝 Generating preview untuk {preview_count} item...")
-                    logging.info(f"   📝 Starting preview loop iteration...")
-                    
-                    # Add timeout protection for preview generation
-                    import time
-                    preview_start_time = time.time()
-                    PREVIEW_TIMEOUT = 30  # 30 seconds timeout
-                    
-                    try:
-                        for i in range(preview_count):
-                            # Check timeout
-                            if time.time() - preview_start_time > PREVIEW_TIMEOUT:
-                                logging.error(f"⏰ TIMEOUT: Preview generation exceeded {PREVIEW_TIMEOUT} seconds")
-                                break
-                                
-                            logging.info(f"      🔄 Processing preview item {i+1}/{preview_count}...")
-                            try:
-                                item = output_list[i]
-                                logging.info(f"      └─ Item {i+1} retrieved, type: {type(item)}")
-                                
-                                if isinstance(item, dict):
-                                    item_id = item.get('id', 'N/A')
-                                    item_label = item.get('label', 'N/A')
-                                    item_justifikasi = item.get('justifikasi', 'N/A')
-                                    logging.info(f"      └─ Item {i+1}: ID={item_id}, Label={item_label}")
-                                    
-                                    # Safe justifikasi processing with timeout check
-                                    if time.time() - preview_start_time > PREVIEW_TIMEOUT:
-                                        logging.error(f"⏰ TIMEOUT during justifikasi processing")
-                                        break
-                                        
-                                    justifikasi_preview = str(item_justifikasi)[:50] if item_justifikasi else 'N/A'
-                                    logging.info(f"         Justifikasi preview: '{justifikasi_preview}...'")
-                                else:
-                                    item_preview = str(item)[:100] if item else 'N/A'
-                                    logging.info(f"      Item {i+1}: {item_preview}...")
-                                    
-                                logging.info(f"      ✅ Item {i+1} preview completed")
-                            except Exception as item_error:
-                                logging.error(f"      ❌ Error processing item {i+1}: {item_error}")
-                                try:
-                                    item_content = str(output_list[i])[:200] if i < len(output_list) else 'Index out of range'
-                                    logging.error(f"         Item content: {item_content}...")
-                                except:
-                                    logging.error(f"         Could not preview item content")
-                        
-                        preview_duration = time.time() - preview_start_time
-                        logging.info(f"✅ Preview loop completed successfully in {preview_duration:.2f} seconds")
-                        
-                        if len(output_list) > 3:
-                            logging.info(f"   📝 ... dan {len(output_list) - 3} item lainnya")
-                        
-                    except Exception as preview_error:
-                        logging.error(f"❌ Error during preview generation: {preview_error}")
-                        logging.error(f"   └─ This might indicate data format issues")
-                        import traceback
-                        logging.error(f"   └─ Traceback: {traceback.format_exc()}")
-                else:
-                    logging.warning(f"   ⚠️ Output tidak dalam format yang diharapkan: {str(output_list)[:200]}...")
-
-                logging.info(f"🔍 Starting validation process...")
-                logging.info(f"   └─ Expected items: {len(unlabeled_in_batch)}")
-                logging.info(f"   └─ Received items: {len(output_list) if isinstance(output_list, list) else 'non-list'}")
-                logging.info(f"   └─ Type check: {type(output_list)}")
-                
-                # <<< PERUBAHAN 2: Validasi disesuaikan dengan jumlah data yang dikirim >>>
-                if not isinstance(output_list, list) or len(output_list) != len(unlabeled_in_batch):
-                    logging.warning(f"❌ Jumlah output JSON tidak sesuai. Diharapkan {len(unlabeled_in_batch)}, diterima {len(output_list)}. Mencoba lagi...")
-                    time.sleep(3)
-                    continue
-                
-                logging.info(f"✅ Validation PASSED - data format dan jumlah sesuai!")
-                logging.info(f"✅ Batch {start+1}-{end} berhasil diproses dan divalidasi!")
-                logging.info(f"🎯 Keluar dari loop retry, melanjutkan ke penyimpanan...")
-                is_batch_valid = True
-
-            except Exception as e:
-                # ... (logika error handling tetap sama) ...
-                logging.error(f"Error pada API Key #{current_key_index + 1} saat memproses batch {start+1}-{end}", exc_info=True)
-                error_string = str(e).lower()
-                if "max_tokens" in error_string or "finish reason: max_tokens" in error_string:
-                    logging.error(f"⛔️ ERROR TOKEN LIMIT! Menyimpan batch {start+1}-{end} dengan hasil parsial...")
-                    batch_slice.to_excel(batch_filepath, index=False) # Save partial results
-                    token_limit_error_detected = True
+                if not pending:
                     break
-                if any(keyword in error_string for keyword in ["quota", "limit", "permission denied"]):
-                    # Coba rotasi model terlebih dahulu
-                    if rotate_model():
-                        # Berhasil beralih ke model baru, coba lagi dengan model baru
-                        logging.info(f"🔄 Mencoba ulang batch {start+1}-{end} dengan model baru...")
-                        continue  # Langsung coba lagi tanpa menunggu
-                    else:
-                        # Semua model habis, hentikan proses
-                        logging.error(f"🛑 Menghentikan proses karena semua model mencapai batas kuota.")
-                        batch_error_message = "Semua model mencapai batas kuota"
-                        stop_event.set()
-                        break
-                else:
-                    # Error lain, rotasi API key seperti biasa
-                    rotate_api_key()
-                    batch_error_message = f"API error pada attempt {attempts}"
-                
-                # Adaptive wait time based on batch size
-                base_wait_time = (2 ** attempts) + random.random()
-                if len(unlabeled_in_batch) > 100:
-                    # Longer wait for large batches to avoid overwhelming API
-                    adaptive_wait_time = base_wait_time * 2
-                    logging.info(f"⏳ Large batch detected - extending wait time to {adaptive_wait_time:.1f} seconds")
-                else:
-                    adaptive_wait_time = base_wait_time
-                
-                time.sleep(adaptive_wait_time)
 
-            # <<< SESSION TRACKING: End batch dengan hasil >>>
-            logging.info(f"🔄 Post-processing batch {start+1}-{end} - checking is_batch_valid: {is_batch_valid}")
-            
-            if is_batch_valid:
-                logging.info(f"✅ Batch VALID - starting DataFrame creation and storage...")
-                
-                try:
-                    output_df = pd.DataFrame(output_list)
-                    logging.info(f"📊 DataFrame created successfully from output_list")
-                except Exception as df_error:
-                    logging.error(f"❌ Error creating DataFrame: {df_error}")
-                    raise df_error
-                
-                logging.info(f"💾 Menyimpan hasil batch {start+1}-{end}:")
-                logging.info(f"   📊 DataFrame shape: {output_df.shape}")
-                logging.info(f"   📋 Columns: {list(output_df.columns) if not output_df.empty else 'Empty DataFrame'}")
-                
-                label_distribution = None
-                if not output_df.empty:
-                    # Tampilkan statistik label sebelum menyimpan
-                    if 'label' in output_df.columns:
-                        label_counts = output_df['label'].value_counts()
-                        label_distribution = dict(label_counts)
-                        logging.info(f"   📈 Distribusi label: {label_distribution}")
-                    
-                    # Update working_df dengan hasil dari batch (single file approach)
-                    # Siapkan kedua DataFrame dengan 'id' sebagai index
-                    output_df.set_index('id', inplace=True)
-                    
-                    # Update working_df langsung untuk baris yang diproses
-                    for idx, row in output_df.iterrows():
-                        working_df.loc[working_df['id'] == idx, 'label'] = row['label']
-                        working_df.loc[working_df['id'] == idx, 'justifikasi'] = row['justifikasi']
-
-                # Save ke single output file (bukan per batch)
-                working_df.to_excel(output_filepath, index=False)
-                logging.info(f"   💾 Single file updated: {os.path.basename(output_filepath)}")
-                
-                # Calculate current progress
-                labeled_count = working_df['label'].notna().sum()
-                total_count = len(working_df)
-                progress_percent = (labeled_count / total_count * 100) if total_count > 0 else 0
-                logging.info(f"   📊 Progress: {labeled_count}/{total_count} ({progress_percent:.1f}%) completed")
-                
-                # Session tracking untuk batch sukses
-                session_manager.end_batch(
-                    batch_info, 
-                    success=True, 
-                    items_processed=len(unlabeled_in_batch),
-                    items_failed=0,
-                    label_distribution=label_distribution,
-                    model_used=CONFIG.get('MODEL_NAME'),
-                    api_key_index=current_key_index + 1
-                )
-                
-            elif not token_limit_error_detected:
-                logging.warning(f"Gagal memproses {len(unlabeled_in_batch)} baris dalam batch {start+1}-{end} setelah {max_retry} percobaan.")
-                # Save current state ke single output file
-                working_df.to_excel(output_filepath, index=False)
-                logging.info(f"   💾 Current progress saved: {os.path.basename(output_filepath)}")
-                
-                # Calculate current progress
-                labeled_count = working_df['label'].notna().sum()
-                total_count = len(working_df)
-                progress_percent = (labeled_count / total_count * 100) if total_count > 0 else 0
-                logging.info(f"   ⚠️  Progress: {labeled_count}/{total_count} ({progress_percent:.1f}%) - batch failed")
-                
-                # Session tracking untuk batch gagal
-                session_manager.end_batch(
-                    batch_info,
-                    success=False,
-                    items_processed=0,
-                    items_failed=len(unlabeled_in_batch),
-                    error_message=batch_error_message or f"Gagal setelah {max_retry} percobaan",
-                    model_used=CONFIG.get('MODEL_NAME'),
-                    api_key_index=current_key_index + 1
-                )
-            else:
-                # Token limit error - save current state
-                working_df.to_excel(output_filepath, index=False)
-                logging.info(f"   💾 Current progress saved (token limit): {os.path.basename(output_filepath)}")
-                
-                # Calculate current progress
-                labeled_count = working_df['label'].notna().sum()
-                total_count = len(working_df)
-                progress_percent = (labeled_count / total_count * 100) if total_count > 0 else 0
-                logging.info(f"   ⚠️  Progress: {labeled_count}/{total_count} ({progress_percent:.1f}%) - token limit")
-                
-                # Token limit error
-                session_manager.end_batch(
-                    batch_info,
-                    success=False,
-                    items_processed=0,
-                    items_failed=len(unlabeled_in_batch),
-                    error_message="Token limit exceeded",
-                    model_used=CONFIG.get('MODEL_NAME'),
-                    api_key_index=current_key_index + 1
-                )
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    _commit_batch_result(working_df, checkpoint_writer, text_column_name, session_manager, job, future.result(), progress_info, duplicate_index)
+                    progress_bar.update(1)
+
+        if stop_event.is_set():
+            logging.warning("🛑 Proses dihentikan (oleh pengguna atau karena semua model mencapai batas kuota).")
 
-            # Adaptive delay between batches based on batch size
-            logging.info(f"🔄 Batch {start+1}-{end} processing completed, preparing for next batch...")
-            
-            if len(unlabeled_in_batch) > 100:
-                inter_batch_delay = 5  # 5 seconds for large batches
-                logging.info(f"⏳ Large batch completed - waiting {inter_batch_delay}s before next batch...")
-            else:
-                inter_batch_delay = 2  # 2 seconds for normal batches
-                logging.info(f"⏳ Batch completed - waiting {inter_batch_delay}s before next batch...")
-            
-            time.sleep(inter_batch_delay)
-            logging.info(f"✅ Inter-batch delay completed, continuing to next iteration...")
-            
-            # Cek apakah proses dihentikan karena semua model habis
-            if stop_event.is_set():
-                logging.warning("🛑 Proses dihentikan karena semua model mencapai batas kuota harian.")
-                break
-        
         # Session completed - single file output
         logging.info("🏁 Semua batch telah diproses!")
         
         # Final save and progress report
-        working_df.to_excel(output_filepath, index=False)
-        final_labeled = working_df['label'].notna().sum()
-        final_total = len(working_df)
-        final_percent = (final_labeled / final_total * 100) if final_total > 0 else 0
+        _finalize_output(working_df, checkpoint_writer, output_filepath)
+        final_labeled = progress_info['labeled']
+        final_total = progress_info['total']
+        final_percent = progress_info['percent']
         
         logging.info(f"📄 Final result: {os.path.basename(output_filepath)}")
         logging.info(f"� Final progress: {final_labeled}/{final_total} ({final_percent:.1f}%) completed")
@@ -893,6 +1907,12 @@ def label_dataset(df_master: pd.DataFrame, base_name: str, batch_size: int, max_
     except Exception as e:
         logging.error(f"❌ Error fatal dalam session: {e}")
     finally:
+        progress_bar.close()
+        checkpoint_writer.close()
+        if response_cache is not None:
+            response_cache.close()
+        # Tulis statistik request yang belum sempat tersimpan oleh maybe_save
+        get_request_tracker().flush()
         # <<< SESSION MANAGEMENT: End session >>>
         if session_manager:
             session_manager.end_session(total_rows)
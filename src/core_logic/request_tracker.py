@@ -24,6 +24,11 @@ from dataclasses import dataclass, asdict
 from collections import defaultdict, deque
 import threading
 
+# Batas penulisan statistik sesi ke disk: simpan jika sudah ada sekian request
+# baru, atau jika request tertua yang belum tersimpan sudah selama ini (detik)
+STATS_SAVE_MIN_COUNT = 10
+STATS_SAVE_MIN_INTERVAL = 5.0
+
 
 class CustomJSONEncoder(json.JSONEncoder):
     """
@@ -98,10 +103,16 @@ class RequestTracker:
         
         # Response time tracking
         self.response_times = deque(maxlen=1000)  # Keep last 1000 response times
+        # Response time request sukses per model (untuk timeout adaptif)
+        self.success_times_per_model = defaultdict(lambda: deque(maxlen=200))
         
         # Thread safety
         self.lock = threading.Lock()
         
+        # Request yang belum tersimpan ke stats_file (untuk maybe_save)
+        self._dirty_count = 0
+        self._dirty_since = time.monotonic()
+        
         # Load historical data if exists
         self._load_historical_stats()
         
@@ -144,6 +155,7 @@ class RequestTracker:
                 self.successful_requests += 1
                 self.success_per_api_key[api_key_index] += 1
                 self.success_per_model[model_name] += 1
+                self.success_times_per_model[model_name].append(response_time)
                 self.api_stats[api_key_index]['successful_requests'] += 1
             else:
                 self.failed_requests += 1
@@ -164,12 +176,53 @@ class RequestTracker:
             # Store in session requests
             self.current_session_requests.append(metrics)
             
-            # Auto-save every 10 requests
-            if request_id % 10 == 0:
-                self._save_session_stats()
+            # Penyimpanan ke disk ditunda ke maybe_save (di luar lock)
+            if self._dirty_count == 0:
+                self._dirty_since = time.monotonic()
+            self._dirty_count += 1
             
             return request_id
     
+    def maybe_save(self, min_interval: float = STATS_SAVE_MIN_INTERVAL, min_count: int = STATS_SAVE_MIN_COUNT) -> bool:
+        """
+        Menyimpan statistik sesi hanya jika ada minimal `min_count` request baru
+        atau request tertua yang belum tersimpan sudah berumur `min_interval` detik.
+        
+        Returns:
+            bool: True jika statistik disimpan
+        """
+        with self.lock:
+            if self._dirty_count == 0:
+                return False
+            if self._dirty_count < min_count and time.monotonic() - self._dirty_since < min_interval:
+                return False
+            # Klaim penyimpanan agar thread lain tidak ikut menulis
+            self._dirty_count = 0
+        self._save_session_stats()
+        return True
+    
+    def record_timeout(self, model_name: str, timeout: float) -> None:
+        """
+        Mencatat request yang melewati timeout sebagai sampel response time sebesar
+        `timeout`, agar p95 (dan timeout adaptif) bisa naik lagi.
+        """
+        with self.lock:
+            self.success_times_per_model[model_name].append(timeout)
+
+    def get_p95_response_time(self, model_name: str, min_samples: int = 5) -> Optional[float]:
+        """
+        Persentil ke-95 response time request sukses terakhir untuk model ini.
+
+        Returns:
+            Optional[float]: p95 dalam detik, atau None jika sampel belum cukup.
+        """
+        with self.lock:
+            samples = self.success_times_per_model.get(model_name)
+            if not samples or len(samples) < min_samples:
+                return None
+            samples = list(samples)
+        return float(np.percentile(samples, 95))
+
     def get_current_stats(self) -> Dict[str, Any]:
         """Get comprehensive statistics for current session"""
         import time
@@ -177,7 +230,7 @@ class RequestTracker:
         STATS_TIMEOUT = 5  # 5 seconds timeout
         
         try:
-            logging.info(f"🔄 Acquiring lock for stats calculation...")
+            logging.debug("🔄 Acquiring lock for stats calculation...")
             
             # Try to acquire lock with timeout
             lock_acquired = self.lock.acquire(blocking=False)
@@ -197,7 +250,7 @@ class RequestTracker:
                 return {"error": "timeout_acquiring_lock"}
             
             try:
-                logging.info(f"🔒 Lock acquired successfully after {lock_attempts * 0.1:.1f} seconds")
+                logging.debug("🔒 Lock acquired successfully after %.1f seconds", lock_attempts * 0.1)
                 
                 # Check timeout
                 if time.time() - stats_start_time > STATS_TIMEOUT:
@@ -205,7 +258,7 @@ class RequestTracker:
                     return {"error": "timeout_during_stats_calculation"}
                 
                 session_duration = (datetime.now() - self.session_start_time).total_seconds()
-                logging.info(f"📊 Building stats dictionary...")
+                logging.debug("📊 Building stats dictionary...")
                 
                 stats = {
                     'session_duration': session_duration,
@@ -218,13 +271,13 @@ class RequestTracker:
                     'api_stats': dict(self.api_stats)  # Make a copy
                 }
                 
-                logging.info(f"✅ Stats calculation completed successfully")
+                logging.debug("✅ Stats calculation completed successfully")
                 return stats
                 
             finally:
                 # Always release the lock
                 self.lock.release()
-                logging.info(f"🔓 Lock released")
+                logging.debug("🔓 Lock released")
         
         except Exception as e:
             logging.error(f"❌ Error in get_current_stats: {str(e)}")
@@ -366,21 +419,26 @@ class RequestTracker:
         
         return "\n".join(report_lines)
     
+    def flush(self) -> None:
+        """Menyimpan statistik sesi ke stats_file sekarang juga (misalnya di akhir session)."""
+        self._save_session_stats()
+
     def _save_session_stats(self):
         """Save current session statistics to file"""
-        import time
         save_start_time = time.time()
+        with self.lock:
+            self._dirty_count = 0
         SAVE_TIMEOUT = 10  # 10 seconds timeout for file operations
         
         try:
-            logging.info(f"🔄 Starting session stats save...")
+            logging.debug("🔄 Starting session stats save...")
             
             # Check timeout before expensive operations
             if time.time() - save_start_time > SAVE_TIMEOUT:
                 logging.error(f"⏰ TIMEOUT: Session stats save exceeded {SAVE_TIMEOUT} seconds")
                 return
             
-            logging.info(f"📊 Generating stats data...")
+            logging.debug("📊 Generating stats data...")
             stats_data = {
                 "session_info": {
                     "start_time": self.session_start_time.isoformat(),
@@ -395,12 +453,12 @@ class RequestTracker:
                 logging.error(f"⏰ TIMEOUT: Session stats save exceeded {SAVE_TIMEOUT} seconds before file write")
                 return
             
-            logging.info(f"💾 Writing stats to file: {self.stats_file}")
+            logging.debug("💾 Writing stats to file: %s", self.stats_file)
             with open(self.stats_file, 'w') as f:
                 json.dump(stats_data, f, indent=2, cls=CustomJSONEncoder)
             
             save_duration = time.time() - save_start_time
-            logging.info(f"✅ Session stats saved successfully in {save_duration:.2f} seconds")
+            logging.debug("✅ Session stats saved successfully in %.2f seconds", save_duration)
                 
         except Exception as e:
             save_duration = time.time() - save_start_time
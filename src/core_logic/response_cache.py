@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+response_cache.py - Cache persisten untuk respons Gemini
+
+Menyimpan output batch yang sudah tervalidasi di SQLite, dengan key
+sha256(versi cache, model, generation config, prompt). Run ulang pada data
+yang sama (misalnya setelah file hasil dihapus) tidak perlu mengirim
+request yang identik lagi ke API.
+
+- Entri kedaluwarsa setelah TTL
+- Jumlah entri dibatasi; entri yang paling lama tidak dipakai dibuang (LRU)
+- Aman dipakai dari banyak thread worker
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Optional
+
+# Naikkan jika format prompt/output berubah agar entri lama tidak terpakai
+CACHE_VERSION = 1
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class ResponseCache:
+    """
+    Cache respons Gemini berbasis SQLite dengan TTL dan eviksi LRU.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed)")
+
+    @staticmethod
+    def make_key(model_name: str, generation_config: Any, prompt: str) -> str:
+        """Key cache untuk satu request (config dibandingkan lewat repr-nya)."""
+        raw = f"{CACHE_VERSION}|{model_name}|{generation_config!r}|{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Mengembalikan output tersimpan, atau None jika tidak ada/kedaluwarsa."""
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value, created = row
+                if now - created > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            # Cache hanya optimasi; kegagalan baca diperlakukan sebagai miss
+            logging.warning(f"⚠️ Gagal membaca cache respons: {e}")
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """Menyimpan output (harus bisa di-serialize ke JSON) lalu membuang entri berlebih."""
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, payload, now, now),
+                )
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"⚠️ Gagal menyimpan cache respons: {e}")
+
+    def close(self) -> None:
+        """Menutup koneksi database."""
+        with self._lock:
+            self._conn.close()
+
+
+def open_response_cache(output_dir: str, enabled: bool = True, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES) -> Optional[ResponseCache]:
+    """
+    Membuka cache respons di `<output_dir>/.gemini_cache.sqlite`.
+
+    Nilai parameter berasal dari setting .env yang sudah divalidasi
+    `env_manager.load_env_variables` (RESPONSE_CACHE, CACHE_TTL dalam detik,
+    CACHE_MAX_ENTRIES).
+
+    Returns:
+        Optional[ResponseCache]: Cache, atau None jika dinonaktifkan/gagal dibuka.
+    """
+    if not enabled:
+        return None
+    try:
+        return ResponseCache(
+            os.path.join(output_dir, ".gemini_cache.sqlite"),
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+        )
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"⚠️ Cache respons tidak bisa dibuka ({e}), melanjutkan tanpa cache.")
+        return None
@@ -10,6 +10,9 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 import pandas as pd
 
+# Direktori dasar log session (relatif terhadap working directory)
+SESSION_LOG_DIR = "logs"
+
 
 class CustomJSONEncoder(json.JSONEncoder):
     """
@@ -96,7 +99,7 @@ class SessionManager:
         self.batch_size = batch_size
         
         # Create session directory structure
-        self.base_log_dir = "logs"
+        self.base_log_dir = SESSION_LOG_DIR
         self.session_dir = os.path.join(self.base_log_dir, "sessions", f"session_{self.session_id}")
         self._create_session_directory()
         
@@ -981,7 +981,8 @@ Configuration:
             # Calculate metrics
             import google.generativeai as genai
             model = genai.GenerativeModel(model_name)
-            metrics = check_tokens.calculate_token_metrics(model, sample_prompt, len(df), batch_size)
+            # Estimasi lokal (tiktoken) tanpa request API per analisis
+            metrics = check_tokens.calculate_token_metrics(model, sample_prompt, len(df), batch_size, accurate=False)
             
             # Generate report
             report = check_tokens.generate_token_report(
@@ -61,6 +61,16 @@ def mock_api_keys():
     return ['TEST_KEY_1', 'TEST_KEY_2', 'TEST_KEY_3']
 
 
+@pytest.fixture(autouse=True)
+def isolate_log_output(tmp_path, monkeypatch):
+    """Fixture agar log session dan statistik request ditulis ke tmp_path, bukan ke logs/ di repo"""
+    from src.core_logic import session_manager, request_tracker
+    
+    log_dir = tmp_path / "run_logs"
+    monkeypatch.setattr(session_manager, 'SESSION_LOG_DIR', str(log_dir))
+    monkeypatch.setattr(request_tracker, '_request_tracker', request_tracker.RequestTracker(stats_file=str(log_dir / "request_stats.json")))
+
+
 @pytest.fixture(autouse=True)
 def cleanup_logging():
     """Fixture untuk membersihkan logging configuration setelah setiap test"""
@@ -0,0 +1,69 @@
+# tests/unit/test_check_tokens.py
+
+import os
+import sys
+import pytest
+import pandas as pd
+from unittest.mock import patch, MagicMock
+
+# Menambahkan path root project untuk import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.core_logic import check_tokens, process
+
+
+class TestCreateSamplePrompt:
+    """Test suite untuk fungsi create_sample_prompt"""
+
+    def test_create_sample_prompt_matches_main_prompt(self):
+        """Test bahwa prompt sampel identik dengan prompt yang dibangun proses utama"""
+        # Setup
+        template = 'Contoh {{"id": 0}}\n{data_json}\nSelesai'
+        df_sample = pd.DataFrame({'id': [0, 1], 'text': ['halo', 'dunia']})
+
+        # Eksekusi
+        with patch.object(check_tokens, 'load_prompt_template', return_value=template):
+            prompt = check_tokens.create_sample_prompt(df_sample, 'text')
+
+        # Verifikasi
+        expected_json = process._dumps_batch_json(df_sample.to_dict(orient='records'))
+        assert prompt == expected_json.join(process.compile_prompt_template(template))
+        assert prompt.startswith('Contoh {"id": 0}\n[')
+
+    def test_create_sample_prompt_follows_template_edits(self, tmp_path, monkeypatch):
+        """Test bahwa perubahan prompt_template.txt langsung terpakai tanpa restart"""
+        # Setup
+        monkeypatch.chdir(tmp_path)
+        template_file = tmp_path / "prompt_template.txt"
+        template_file.write_text("Versi lama {data_json}", encoding="utf-8")
+        df_sample = pd.DataFrame({'id': [0], 'text': ['halo']})
+        first_prompt = check_tokens.create_sample_prompt(df_sample, 'text')
+
+        # Eksekusi
+        template_file.write_text("Versi baru {data_json}", encoding="utf-8")
+        stat = os.stat(template_file)
+        os.utime(template_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second_prompt = check_tokens.create_sample_prompt(df_sample, 'text')
+
+        # Verifikasi
+        assert first_prompt.startswith("Versi lama ")
+        assert second_prompt.startswith("Versi baru ")
+
+
+class TestCalculateTokenMetrics:
+    """Test suite untuk fungsi calculate_token_metrics"""
+
+    def test_calculate_token_metrics_defaults_to_local_estimate(self):
+        """Test bahwa tanpa accurate=True token dihitung lokal, tanpa request count_tokens"""
+        # Setup
+        model = MagicMock()
+
+        # Eksekusi
+        with patch.object(check_tokens, 'estimate_tokens_locally', return_value=100):
+            metrics = check_tokens.calculate_token_metrics(model, "prompt", total_rows=10, batch_size=4)
+
+        # Verifikasi
+        model.count_tokens.assert_not_called()
+        assert metrics['input_tokens_per_batch'] == 100
+        assert metrics['total_batches'] == 3
+        assert metrics['total_input_tokens'] == 300
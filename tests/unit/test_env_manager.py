@@ -0,0 +1,111 @@
+# tests/unit/test_env_manager.py
+
+import os
+import sys
+import pytest
+from unittest.mock import patch
+from dotenv import dotenv_values
+
+# Menambahkan path root project untuk import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.core_logic import env_manager
+
+
+class TestSaveEnvVariables:
+    """Test suite untuk fungsi save_env_variables"""
+
+    def test_save_env_variables_updates_in_place(self, tmp_path):
+        """Test bahwa setting diganti di tempat dan API key lama dibuang"""
+        # Setup
+        env_file = tmp_path / ".env"
+        env_file.write_text(
+            "# komentar\n"
+            "MODEL_NAME='model-lama'\n"
+            "GOOGLE_API_KEY_1='key-lama'\n"
+            "GOOGLE_API_KEY_2='key-lama-2'\n"
+            "LAINNYA=1\n"
+        )
+
+        with patch.object(env_manager, '_ENV_PATH', None), \
+             patch.object(env_manager, 'find_dotenv', return_value=str(env_file)):
+            # Eksekusi
+            env_manager.save_env_variables(
+                {"MODEL_NAME": "model-baru", "OUTPUT_DIR": "hasil"},
+                ["key-baru"]
+            )
+
+        # Verifikasi
+        values = dotenv_values(str(env_file))
+        assert values["MODEL_NAME"] == "model-baru"
+        assert values["OUTPUT_DIR"] == "hasil"
+        assert values["LAINNYA"] == "1"
+        assert values["GOOGLE_API_KEY_1"] == "key-baru"
+        assert "GOOGLE_API_KEY_2" not in values
+        assert env_file.read_text().startswith("# komentar\n")
+
+    def test_save_env_variables_skips_empty_keys(self, tmp_path):
+        """Test bahwa API key kosong tidak disimpan"""
+        env_file = tmp_path / ".env"
+        env_file.write_text("")
+
+        with patch.object(env_manager, '_ENV_PATH', None), \
+             patch.object(env_manager, 'find_dotenv', return_value=str(env_file)):
+            env_manager.save_env_variables({"MODEL_NAME": "m"}, ["k1", "  "])
+
+        values = dotenv_values(str(env_file))
+        assert values["GOOGLE_API_KEY_1"] == "k1"
+        assert "GOOGLE_API_KEY_2" not in values
+
+
+class TestLoadEnvVariables:
+    """Test suite untuk fungsi load_env_variables"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Fixture untuk mengosongkan cache load_env_variables sebelum dan sesudah test"""
+        env_manager.load_env_variables.cache_clear()
+        yield
+        env_manager.load_env_variables.cache_clear()
+
+    def test_load_env_variables_reads_batch_fmt(self):
+        """Test bahwa BATCH_FMT dari .env ikut dimuat ke settings"""
+        with patch.object(env_manager, 'load_dotenv'), \
+             patch.dict(os.environ, {'BATCH_FMT': 'XLSX'}, clear=True):
+            settings, _ = env_manager.load_env_variables()
+
+        assert settings['BATCH_FMT'] == 'xlsx'
+
+    def test_load_env_variables_invalid_batch_fmt_uses_default(self):
+        """Test bahwa BATCH_FMT yang tidak dikenal diganti default"""
+        with patch.object(env_manager, 'load_dotenv'), \
+             patch.dict(os.environ, {'BATCH_FMT': 'csv'}, clear=True):
+            settings, _ = env_manager.load_env_variables()
+
+        assert settings['BATCH_FMT'] == env_manager.BATCH_FORMATS[0]
+
+    def test_load_env_variables_invalid_numbers_use_defaults(self):
+        """Test bahwa setting angka/boolean yang rusak diganti default, bukan menggagalkan session"""
+        env = {'GEMINI_RPM': 'cepat', 'CONCURRENCY': '-2', 'CHECKPOINT_EVERY': '0', 'CACHE_TTL': 'nan',
+               'CACHE_MAX_ENTRIES': '10.5', 'PROMPT_CACHE': 'mungkin', 'RESPONSE_CACHE': 'off'}
+        with patch.object(env_manager, 'load_dotenv'), patch.dict(os.environ, env, clear=True):
+            settings, _ = env_manager.load_env_variables()
+
+        assert settings['GEMINI_RPM'] == env_manager.DEFAULT_GEMINI_RPM
+        assert settings['CONCURRENCY'] == env_manager.DEFAULT_CONCURRENCY
+        assert settings['CHECKPOINT_EVERY'] == env_manager.DEFAULT_CHECKPOINT_EVERY
+        assert settings['CACHE_TTL'] == env_manager.DEFAULT_TTL_SECONDS
+        assert settings['CACHE_MAX_ENTRIES'] == env_manager.DEFAULT_MAX_ENTRIES
+        assert settings['PROMPT_CACHE'] is False
+        assert settings['RESPONSE_CACHE'] is False
+
+    def test_load_env_variables_parses_valid_numbers(self):
+        """Test bahwa setting angka yang valid dimuat dengan tipe yang benar"""
+        env = {'GEMINI_RPM': '15', 'CONCURRENCY': '4', 'CHECKPOINT_EVERY': '3', 'PROMPT_CACHE': 'true'}
+        with patch.object(env_manager, 'load_dotenv'), patch.dict(os.environ, env, clear=True):
+            settings, _ = env_manager.load_env_variables()
+
+        assert settings['GEMINI_RPM'] == 15.0
+        assert settings['CONCURRENCY'] == 4
+        assert settings['CHECKPOINT_EVERY'] == 3
+        assert settings['PROMPT_CACHE'] is True
@@ -1,8 +1,12 @@
 # tests/unit/test_process_utils.py
 
 import os
+import json
+import shutil
 import sys
+import threading
 import pytest
+import numpy as np
 import pandas as pd
 from unittest.mock import patch, MagicMock
 
@@ -62,17 +66,35 @@ class TestRotateApiKey:
             # Verifikasi bahwa genai.configure dipanggil 3 kali
             assert mock_genai.configure.call_count == 3
 
+    def test_rotate_api_key_concurrent_rotations(self):
+        """Test bahwa rotasi paralel tidak melewatkan atau mengulang key"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with patch.object(process, 'API_KEYS', ['KEY1', 'KEY2', 'KEY3', 'KEY4']), \
+             patch.object(process, 'current_key_index', 0), \
+             patch('src.core_logic.process.genai'):
+
+            # Eksekusi: 8 rotasi dari 8 thread
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda _: process.rotate_api_key(), range(8)))
+
+            # Verifikasi: setiap key didapat tepat dua kali dan index kembali ke 0
+            assert sorted(index for index, _ in results) == [0, 0, 1, 1, 2, 2, 3, 3]
+            assert all(key == f"KEY{index + 1}" for index, key in results)
+            assert process.current_key_index == 0
+
 
 class TestOpenDataset:
     """Test suite untuk fungsi open_dataset"""
     
-    def test_open_dataset_csv_success(self):
+    def test_open_dataset_csv_success(self, tmp_path):
         """Test berhasil membuka file CSV"""
-        # Setup
-        test_dir = os.path.join(os.path.dirname(__file__), '..', 'test_dataset')
+        # Setup - salin fixture agar cache dataset tidak ditulis ke source tree
+        fixture = os.path.join(os.path.dirname(__file__), '..', 'test_dataset', 'sample_data.csv')
+        shutil.copy(fixture, tmp_path / 'sample_data.csv')
         
         # Eksekusi
-        df, file_path = process.open_dataset(test_dir, 'sample_data')
+        df, file_path = process.open_dataset(str(tmp_path), 'sample_data')
         
         # Verifikasi
         assert isinstance(df, pd.DataFrame)
@@ -109,7 +131,58 @@ class TestOpenDataset:
         # Verifikasi bahwa CSV diprioritaskan
         assert df['text'].iloc[0] == 'CSV content'
         assert file_path.endswith('.csv')
-    
+
+    def test_open_dataset_xlsx_without_calamine(self, tmp_path):
+        """Test membaca XLSX dengan openpyxl ketika python-calamine tidak terpasang"""
+        # Setup
+        xlsx_file = tmp_path / "test_xlsx.xlsx"
+        pd.DataFrame({'text': ['satu', 'dua'], 'id': [0, 1]}).to_excel(xlsx_file, index=False)
+
+        # Eksekusi
+        with patch.object(process, 'python_calamine', None):
+            df, file_path = process.open_dataset(str(tmp_path), 'test_xlsx')
+
+        # Verifikasi
+        assert df['text'].tolist() == ['satu', 'dua']
+        assert df['id'].tolist() == [0, 1]
+        assert file_path.endswith('.xlsx')
+
+    def test_open_dataset_uses_parquet_cache(self, tmp_path):
+        """Test bahwa pembacaan kedua memakai cache parquet selama CSV tidak berubah"""
+        # Setup
+        csv_file = tmp_path / "cached.csv"
+        pd.DataFrame({'text': ['a', 'b']}).to_csv(csv_file, index=False)
+
+        # Eksekusi
+        first_df, _ = process.open_dataset(str(tmp_path), 'cached')
+        cache_path = process.get_dataset_cache_path(str(csv_file))
+        with patch.object(process.pd, 'read_csv') as mock_read_csv:
+            second_df, file_path = process.open_dataset(str(tmp_path), 'cached')
+
+        # Verifikasi
+        assert os.path.exists(cache_path)
+        mock_read_csv.assert_not_called()
+        assert second_df['text'].tolist() == first_df['text'].tolist()
+        assert file_path.endswith('cached.csv')
+
+    def test_open_dataset_cache_detects_older_replacement(self, tmp_path):
+        """Test bahwa cache tidak dipakai jika dataset diganti file dengan mtime lebih lama"""
+        # Setup
+        csv_file = tmp_path / "cached.csv"
+        pd.DataFrame({'text': ['a', 'b']}).to_csv(csv_file, index=False)
+        process.open_dataset(str(tmp_path), 'cached')
+        cache_mtime = os.path.getmtime(process.get_dataset_cache_path(str(csv_file)))
+
+        # Ganti isi dataset tetapi mundurkan mtime-nya (seperti `cp -p` dari salinan lama)
+        pd.DataFrame({'text': ['lama', 'berbeda', 'isi']}).to_csv(csv_file, index=False)
+        os.utime(csv_file, (cache_mtime - 3600, cache_mtime - 3600))
+
+        # Eksekusi
+        df, _ = process.open_dataset(str(tmp_path), 'cached')
+
+        # Verifikasi
+        assert df['text'].tolist() == ['lama', 'berbeda', 'isi']
+
     def test_open_dataset_file_not_found(self):
         """Test error ketika file tidak ditemukan"""
         test_dir = os.path.join(os.path.dirname(__file__), '..', 'test_dataset')
@@ -169,9 +242,26 @@ class TestLoadPromptTemplate:
         # Eksekusi & Verifikasi
         with pytest.raises(FileNotFoundError) as exc_info:
             process.load_prompt_template('nonexistent_template.txt')
-        
+
         assert "tidak ditemukan" in str(exc_info.value)
 
+    def test_load_prompt_template_reloads_on_mtime_change(self, tmp_path):
+        """Test bahwa template dibaca ulang hanya jika file berubah"""
+        # Setup
+        template_file = tmp_path / "reload_template.txt"
+        template_file.write_text("Versi 1 {data_json}", encoding='utf-8')
+        os.utime(template_file, ns=(1_000_000_000, 1_000_000_000))
+
+        # Eksekusi & Verifikasi
+        assert process.load_prompt_template(str(template_file)) == "Versi 1 {data_json}"
+        with patch('builtins.open') as mock_open:
+            assert process.load_prompt_template(str(template_file)) == "Versi 1 {data_json}"
+            mock_open.assert_not_called()
+
+        template_file.write_text("Versi 2 {data_json}", encoding='utf-8')
+        os.utime(template_file, ns=(2_000_000_000, 2_000_000_000))
+        assert process.load_prompt_template(str(template_file)) == "Versi 2 {data_json}"
+
 
 class TestSetupLogging:
     """Test suite untuk fungsi setup_logging"""
@@ -207,4 +297,637 @@ class TestSetupLogging:
             
             # Verifikasi bahwa logger memiliki handlers
             logger = logging.getLogger()
-            assert len(logger.handlers) >= 2  # FileHandler dan StreamHandler
\ No newline at end of file
+            assert len(logger.handlers) >= 2  # FileHandler dan StreamHandler
+
+    def test_setup_logging_writes_through_queue_listener(self, tmp_path):
+        """Test bahwa record dari QueueHandler ditulis listener ke file log"""
+        import logging
+        from logging.handlers import QueueHandler
+
+        # Setup
+        test_log_dir = str(tmp_path / "test_logs")
+
+        with patch.object(process, 'LOG_DIR', test_log_dir):
+            # Eksekusi
+            process.setup_logging()
+            record = logging.LogRecord('root', logging.INFO, __file__, 0, "pesan %s", ("uji",), None)
+            queue_handler = QueueHandler(process._LOG_QUEUE)
+            queue_handler.setFormatter(logging.Formatter("%(message)s"))
+            queue_handler.handle(record)
+            process._stop_log_listener()
+
+            # Verifikasi: listener berhenti setelah menulis sisa antrean dengan format lengkap
+            assert process._LOG_LISTENER is None
+            log_file = os.path.join(test_log_dir, os.listdir(test_log_dir)[0])
+            with open(log_file, encoding='utf-8') as f:
+                assert f.read().endswith(" - INFO - pesan uji\n")
+
+class TestPropagateDuplicateLabels:
+    """Test suite untuk fungsi propagate_duplicate_labels"""
+    
+    def test_propagate_duplicate_labels_fills_identical_texts(self):
+        """Test bahwa baris dengan teks identik mendapat label yang sama"""
+        # Setup
+        df = pd.DataFrame({
+            'id': [0, 1, 2, 3],
+            'text': ['halo', 'dunia', 'halo', 'lain'],
+            'label': ['POSITIF', None, None, None],
+            'justifikasi': ['alasan', None, None, None]
+        })
+        
+        # Eksekusi
+        filled = process.propagate_duplicate_labels(df, 'text')
+        
+        # Verifikasi
+        assert filled == 1
+        assert df.loc[2, 'label'] == 'POSITIF'
+        assert df.loc[2, 'justifikasi'] == 'alasan'
+        assert pd.isna(df.loc[1, 'label'])
+        assert pd.isna(df.loc[3, 'label'])
+    
+    def test_propagate_duplicate_labels_no_labeled_rows(self):
+        """Test bahwa tidak ada perubahan jika belum ada baris berlabel"""
+        df = pd.DataFrame({
+            'id': [0, 1],
+            'text': ['halo', 'halo'],
+            'label': [None, None],
+            'justifikasi': [None, None]
+        })
+        
+        assert process.propagate_duplicate_labels(df, 'text') == 0
+        assert df['label'].isna().all()
+
+
+class TestDuplicateIndex:
+    """Test suite untuk class DuplicateIndex"""
+
+    def test_duplicate_index_propagates_only_batch_texts(self):
+        """Test bahwa hanya teks dari posisi batch yang disebarkan ke duplikat belum berlabel"""
+        # Setup
+        df = pd.DataFrame({
+            'id': [0, 1, 2, 3, 4, 5],
+            'text': ['halo', 'dunia', 'halo', None, 'dunia', None],
+            'label': pd.array(['positif', 'negatif', None, 'netral', None, None], dtype=process.RESULT_DTYPE),
+            'justifikasi': pd.array(['a', 'b', None, 'c', None, None], dtype=process.RESULT_DTYPE),
+        })
+        duplicate_index = process.DuplicateIndex(df['text'])
+
+        # Eksekusi: hanya posisi 0 dan 3 yang baru dilabeli
+        filled = duplicate_index.propagate(df, np.array([0, 3]))
+
+        # Verifikasi
+        assert filled == 1
+        assert df.loc[2, 'label'] == 'positif'
+        assert df.loc[2, 'justifikasi'] == 'a'
+        assert pd.isna(df.loc[4, 'label'])  # 'dunia' bukan bagian batch ini
+        assert pd.isna(df.loc[5, 'label'])  # Teks kosong tidak dianggap duplikat
+
+    def test_duplicate_index_no_duplicates(self):
+        """Test bahwa dataset tanpa duplikat tidak mengubah apa pun"""
+        # Setup
+        df = pd.DataFrame({
+            'text': ['a', 'b', 'c'],
+            'label': pd.array(['positif', None, None], dtype=process.RESULT_DTYPE),
+            'justifikasi': pd.array(['x', None, None], dtype=process.RESULT_DTYPE),
+        })
+
+        # Eksekusi & Verifikasi
+        assert process.DuplicateIndex(df['text']).propagate(df, np.array([0])) == 0
+        assert df['label'].count() == 1
+
+class TestCompilePromptTemplate:
+    """Test suite untuk fungsi compile_prompt_template"""
+    
+    def test_compile_prompt_template_matches_format(self):
+        """Test bahwa hasil join segmen sama dengan str.format pada template"""
+        # Setup: template hasil load_prompt_template (kurung kurawal sudah di-escape)
+        template = 'Contoh: {{"label": "X"}}\nData:\n{data_json}\nSelesai.'
+        data_json = '[{"id": 1, "text": "halo"}]'
+        
+        # Eksekusi
+        segments = process.compile_prompt_template(template)
+        
+        # Verifikasi
+        assert len(segments) == 2
+        assert data_json.join(segments) == template.format(data_json=data_json)
+
+
+class TestValidateBatchOutput:
+    """Test suite untuk fungsi _validate_batch_output"""
+    
+    def test_validate_batch_output_reorders_by_id(self):
+        """Test bahwa output valid diurutkan sesuai id yang dikirim"""
+        output = [
+            {'id': 2, 'label': 'negatif', 'justifikasi': 'b'},
+            {'id': 1, 'label': 'POSITIF', 'justifikasi': 'a'}
+        ]
+        
+        is_valid, reason, output_df = process._validate_batch_output(
+            output, np.array([1, 2]), frozenset({'positif', 'negatif'})
+        )
+        
+        assert is_valid, reason
+        assert list(output_df['label']) == ['POSITIF', 'negatif']
+        assert list(output_df['justifikasi']) == ['a', 'b']
+    
+    def test_validate_batch_output_rejects_invalid_label(self):
+        """Test bahwa label di luar daftar membuat batch tidak valid"""
+        output = [{'id': 1, 'label': 'MARAH', 'justifikasi': 'a'}]
+        
+        is_valid, reason, output_df = process._validate_batch_output(
+            output, np.array([1]), frozenset({'positif', 'negatif'})
+        )
+        
+        assert not is_valid
+        assert 'MARAH' in reason
+        assert output_df is None
+    
+    def test_validate_batch_output_rejects_wrong_count(self):
+        """Test bahwa jumlah output yang berbeda membuat batch tidak valid"""
+        is_valid, _, _ = process._validate_batch_output([], np.array([1]), frozenset())
+
+        assert not is_valid
+
+    def test_validate_batch_output_builds_typed_columns(self):
+        """Test bahwa kolom hasil langsung ber-dtype RESULT_DTYPE, termasuk label numerik"""
+        output = [{'id': 1, 'label': 1, 'justifikasi': None}]
+
+        is_valid, reason, output_df = process._validate_batch_output(output, np.array([1]), frozenset({'1'}))
+
+        assert is_valid, reason
+        assert output_df['label'].dtype == process.RESULT_DTYPE
+        assert output_df['label'].tolist() == ['1']
+        assert pd.isna(output_df['justifikasi'].iloc[0])
+
+    def test_validate_batch_output_rejects_non_object_items(self):
+        """Test bahwa item yang bukan objek JSON membuat batch tidak valid"""
+        is_valid, reason, _ = process._validate_batch_output(['positif'], np.array([1]), frozenset())
+
+        assert not is_valid
+        assert 'bukan objek' in reason
+
+
+class TestTokenBucket:
+    """Test suite untuk class TokenBucket"""
+    
+    def test_token_bucket_waits_when_empty(self):
+        """Test bahwa bucket kosong meminta jeda sesuai laju RPM"""
+        bucket = process.TokenBucket(rpm=60)
+        now = bucket.last
+        
+        for _ in range(60):
+            assert bucket.wait_time(now) == 0.0
+            bucket.take(now)
+        
+        # Verifikasi: 60 RPM = 1 token per detik
+        assert bucket.wait_time(now) == pytest.approx(1.0)
+        assert bucket.wait_time(now + 1.0) == 0.0
+    
+    def test_token_bucket_decay_and_recover(self):
+        """Test bahwa laju turun setelah error kuota dan pulih setelah sukses"""
+        bucket = process.TokenBucket(rpm=60)
+        
+        bucket.decay()
+        assert bucket.rate == pytest.approx(0.5)
+        
+        for _ in range(20):
+            bucket.recover()
+        assert bucket.rate == pytest.approx(bucket.base_rate)
+
+
+class TestCheckpointWriter:
+    """Test suite untuk class CheckpointWriter"""
+    
+    def test_checkpoint_writer_writes_latest_snapshot(self, tmp_path):
+        """Test bahwa checkpoint berisi snapshot terakhir setelah close"""
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({'id': [0, 1], 'label': [None, None]})
+        writer = process.CheckpointWriter(filepath)
+        
+        # Eksekusi
+        writer.submit(working_df)
+        working_df.loc[0, 'label'] = 'positif'
+        writer.submit(working_df)
+        working_df.loc[1, 'label'] = 'negatif'  # Perubahan setelah submit tidak ikut tertulis
+        writer.close()
+        
+        # Verifikasi
+        saved_df = process._read_working_file(filepath)
+        assert saved_df['label'].tolist()[0] == 'positif'
+        assert pd.isna(saved_df['label'].tolist()[1])
+
+    def test_checkpoint_writer_every_n_flushes_on_close(self, tmp_path):
+        """Test bahwa checkpoint hanya ditulis tiap N submit dan sisanya ditulis saat close"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        checkpoint_path = process.get_checkpoint_path(filepath)
+        working_df = pd.DataFrame({'id': [0, 1], 'label': [None, None]})
+        writer = process.CheckpointWriter(filepath, every=3)
+
+        # Eksekusi: dua submit belum mencapai N
+        writer.submit(working_df)
+        working_df.loc[0, 'label'] = 'positif'
+        writer.submit(working_df)
+        with patch.object(process, 'save_checkpoint', wraps=process.save_checkpoint) as mock_save:
+            writer.close()
+
+        # Verifikasi
+        mock_save.assert_called_once()
+        assert os.path.exists(checkpoint_path)
+        assert process._read_working_file(filepath)['label'].tolist()[0] == 'positif'
+
+    def test_finalize_output_keeps_progress_when_save_fails(self, tmp_path):
+        """Test bahwa progress yang belum di-checkpoint tetap tersimpan jika xlsx final gagal ditulis"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({'id': [0, 1], 'label': [None, None]})
+        writer = process.CheckpointWriter(filepath, every=10)
+        working_df.loc[0, 'label'] = 'positif'
+        writer.submit(working_df)
+
+        # Eksekusi
+        with patch.object(process, 'save_output_file', side_effect=OSError("disk penuh")):
+            with pytest.raises(OSError):
+                process._finalize_output(working_df, writer, filepath)
+
+        # Verifikasi
+        assert os.path.exists(process.get_checkpoint_path(filepath))
+        assert process._read_working_file(filepath)['label'].tolist()[0] == 'positif'
+
+    def test_finalize_output_removes_checkpoint(self, tmp_path):
+        """Test bahwa checkpoint dihapus setelah xlsx final berhasil ditulis"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({'id': [0, 1], 'label': ['positif', None]})
+        writer = process.CheckpointWriter(filepath)
+        writer.submit(working_df)
+
+        # Eksekusi
+        process._finalize_output(working_df, writer, filepath)
+
+        # Verifikasi
+        assert os.path.exists(filepath)
+        assert not os.path.exists(process.get_checkpoint_path(filepath))
+
+    def test_save_checkpoint_respects_batch_fmt_setting(self, tmp_path):
+        """Test bahwa BATCH_FMT=xlsx dari konfigurasi menulis xlsx, bukan checkpoint parquet"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({'id': [0, 1], 'label': ['positif', None]})
+
+        # Eksekusi
+        with patch.dict(process.CONFIG, {'BATCH_FMT': 'xlsx'}):
+            process.save_checkpoint(working_df, filepath)
+
+        # Verifikasi
+        assert os.path.exists(filepath)
+        assert not os.path.exists(process.get_checkpoint_path(filepath))
+
+    def test_read_working_file_xlsx_uses_fast_engine(self, tmp_path):
+        """Test bahwa resume tanpa checkpoint membaca xlsx dengan engine dari get_excel_engine"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        pd.DataFrame({'id': [0, 1], 'label': ['positif', None]}).to_excel(filepath, index=False)
+
+        # Eksekusi
+        with patch.object(process.pd, 'read_excel', wraps=pd.read_excel) as mock_read_excel:
+            saved_df = process._read_working_file(filepath)
+
+        # Verifikasi
+        assert mock_read_excel.call_args.kwargs['engine'] == process.get_excel_engine()
+        assert saved_df['label'].tolist()[0] == 'positif'
+
+
+class TestSaveOutputFile:
+    """Test suite untuk fungsi save_output_file"""
+
+    def test_save_output_file_roundtrip_clips_long_text(self, tmp_path):
+        """Test bahwa output tertulis utuh per baris, sel kosong tetap kosong, dan teks panjang dipotong"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({
+            'id': [0, 1, 2],
+            'text': ['=1+1', 'halo', None],
+            'label': pd.array(['positif', None, 'negatif'], dtype=process.RESULT_DTYPE),
+            'justifikasi': pd.array(['x' * 40000, None, 'singkat'], dtype=process.RESULT_DTYPE),
+        })
+
+        # Eksekusi
+        process.save_output_file(working_df, filepath)
+
+        # Verifikasi
+        saved_df = process._read_working_file(filepath)
+        assert not os.path.exists(f"{filepath}.part")
+        assert saved_df['id'].tolist() == [0, 1, 2]
+        assert saved_df['text'].tolist()[0] == '=1+1'
+        assert pd.isna(saved_df['label'].tolist()[1])
+        assert saved_df['label'].tolist()[2] == 'negatif'
+        assert len(saved_df['justifikasi'].tolist()[0]) == process.EXCEL_MAX_CELL_CHARS
+
+    def test_save_output_file_all_na_text_columns(self, tmp_path):
+        """Test bahwa kolom label/justifikasi yang seluruhnya kosong tetap bisa disimpan"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({
+            'id': [0, 1],
+            'label': pd.array([None, None], dtype=process.RESULT_DTYPE),
+            'justifikasi': pd.array([None, None], dtype=process.RESULT_DTYPE),
+        })
+
+        # Eksekusi
+        process.save_output_file(working_df, filepath)
+
+        # Verifikasi
+        saved_df = process._read_working_file(filepath)
+        assert saved_df['id'].tolist() == [0, 1]
+        assert saved_df['label'].isna().all()
+
+    def test_save_output_file_without_xlsxwriter_falls_back(self, tmp_path):
+        """Test bahwa tanpa xlsxwriter output tetap ditulis lewat openpyxl"""
+        # Setup
+        filepath = str(tmp_path / "data_labeled.xlsx")
+        working_df = pd.DataFrame({'id': [0, 1], 'label': ['positif', None]})
+
+        # Eksekusi
+        with patch.object(process, 'xlsxwriter', None):
+            process.save_output_file(working_df, filepath)
+
+        # Verifikasi
+        saved_df = process._read_working_file(filepath)
+        assert saved_df['label'].tolist()[0] == 'positif'
+        assert pd.isna(saved_df['label'].tolist()[1])
+
+
+class TestRetryBackoff:
+    """Test suite untuk fungsi _retry_delay dan _is_unrecoverable_error"""
+    
+    def test_retry_delay_grows_with_jitter_and_cap(self):
+        """Test bahwa jeda retry tumbuh eksponensial dalam rentang jitter dan dibatasi"""
+        for attempt in range(1, 4):
+            base = process.RETRY_BASE_DELAY * (2 ** attempt)
+            delay = process._retry_delay(attempt)
+            assert base * (1 - process.RETRY_JITTER) <= delay <= base * (1 + process.RETRY_JITTER)
+        
+        assert process._retry_delay(10) <= process.RETRY_MAX_DELAY
+    
+    def test_is_unrecoverable_error(self):
+        """Test klasifikasi error yang tidak perlu dicoba ulang"""
+        from google.api_core import exceptions as google_exceptions
+        
+        def wrapped(cause):
+            try:
+                raise Exception(f"Error saat request API: {cause}") from cause
+            except Exception as e:
+                return e
+        
+        assert process._is_unrecoverable_error(wrapped(google_exceptions.InvalidArgument("Request contains an invalid argument.")))
+        assert not process._is_unrecoverable_error(wrapped(google_exceptions.InvalidArgument("API key not valid.")))
+        assert not process._is_unrecoverable_error(wrapped(google_exceptions.ServiceUnavailable("overloaded")))
+
+
+class TestKeyPoolCircuitBreaker:
+    """Test suite untuk circuit breaker di KeyPool"""
+    
+    def test_circuit_opens_after_consecutive_failures(self):
+        """Test bahwa key diistirahatkan setelah kegagalan beruntun dan pulih setelah sukses"""
+        pool = process.KeyPool(['KEY1'])
+        
+        with patch.object(pool, 'cooldown') as mock_cooldown:
+            for _ in range(process.CIRCUIT_FAILURE_THRESHOLD - 1):
+                assert not pool.record_failure(0, 'gemini-test')
+            assert pool.record_failure(0, 'gemini-test')
+            mock_cooldown.assert_called_once_with(0, process.CIRCUIT_OPEN_SECONDS)
+            
+            # Model lain punya circuit sendiri; sukses menutup circuit
+            assert not pool.record_failure(0, 'gemini-lain')
+            pool.record_success(0, 'gemini-test')
+            assert not pool.record_failure(0, 'gemini-test')
+
+
+class TestKeyPoolQuota:
+    """Test suite untuk pencatatan error kuota di KeyPool"""
+
+    def test_success_clears_quota_hit(self):
+        """Test bahwa sukses pada key menghapus catatan kuotanya sehingga model tidak diganti"""
+        # Setup
+        pool = process.KeyPool(['KEY1', 'KEY2'])
+
+        with patch.object(pool, 'cooldown'):
+            # Eksekusi
+            assert not pool.mark_quota_exhausted(0, 'gemini-test')
+            pool.record_success(0, 'gemini-test')
+            all_exhausted = pool.mark_quota_exhausted(1, 'gemini-test')
+
+        # Verifikasi
+        assert not all_exhausted
+
+    def test_quota_hits_expire_after_window(self):
+        """Test bahwa error kuota lama di luar jendela tidak ikut dihitung"""
+        # Setup
+        pool = process.KeyPool(['KEY1', 'KEY2'])
+
+        with patch.object(pool, 'cooldown'), patch.object(process.time, 'monotonic') as mock_monotonic:
+            # Eksekusi
+            mock_monotonic.return_value = 1000.0
+            pool.mark_quota_exhausted(0, 'gemini-test')
+            mock_monotonic.return_value = 1000.0 + process.QUOTA_HIT_WINDOW_SECONDS + 1
+            expired = pool.mark_quota_exhausted(1, 'gemini-test')
+            all_exhausted = pool.mark_quota_exhausted(0, 'gemini-test')
+
+        # Verifikasi
+        assert not expired
+        assert all_exhausted
+    def test_quota_error_does_not_use_retry_attempt(self):
+        """Test bahwa error kuota tidak menghabiskan jatah retry batch"""
+        # Setup
+        pool = process.KeyPool(['KEY1', 'KEY2'])
+        job = {'start': 0, 'end': 1, 'item_count': 1, 'data_json': '[]', 'ids': np.array([0])}
+        output = [{'id': 0, 'label': 'positif', 'justifikasi': 'a'}]
+
+        with patch.object(pool, 'cooldown'), \
+             patch.dict(process.CONFIG, {'MODEL_NAME': 'gemini-test'}), \
+             patch.object(process, 'generate_from_gemini', side_effect=[Exception("429 quota exceeded"), output]):
+            # Eksekusi
+            result = process._label_batch_worker(job, ('', ''), {}, 1, frozenset(), pool, threading.Event())
+
+        # Verifikasi
+        assert result['status'] == 'valid'
+
+class TestKeyPoolPromptCache:
+    """Test suite untuk context cache prompt di KeyPool"""
+
+    def test_get_cached_model_creates_cache_once(self):
+        """Test bahwa context cache dibuat sekali per (key, model) lalu dipakai ulang"""
+        # Setup
+        pool = process.KeyPool(['KEY1'])
+        cache_client = MagicMock()
+        cache_client.create_cached_content.return_value.name = 'cachedContents/abc'
+
+        with patch.object(process.glm, 'CacheServiceClient', return_value=cache_client), \
+             patch.object(pool, 'get_client', return_value=MagicMock()):
+            # Eksekusi
+            model = pool.get_cached_model(0, 'gemini-test', 'Instruksi statis ')
+            again = pool.get_cached_model(0, 'gemini-test', 'Instruksi statis ')
+
+        # Verifikasi
+        assert model is again
+        assert model.cached_content == 'cachedContents/abc'
+        cache_client.create_cached_content.assert_called_once()
+
+    def test_get_cached_model_falls_back_when_creation_fails(self):
+        """Test bahwa None dikembalikan (dan tidak dicoba ulang) jika cache gagal dibuat"""
+        # Setup
+        pool = process.KeyPool(['KEY1'])
+        cache_client = MagicMock()
+        cache_client.create_cached_content.side_effect = Exception("token count below minimum")
+
+        with patch.object(process.glm, 'CacheServiceClient', return_value=cache_client):
+            # Eksekusi & Verifikasi
+            assert pool.get_cached_model(0, 'gemini-test', 'pendek') is None
+            assert pool.get_cached_model(0, 'gemini-test', 'pendek') is None
+
+        cache_client.create_cached_content.assert_called_once()
+
+    def test_get_cached_model_slow_creation_does_not_block_other_keys(self):
+        """Test bahwa pembuatan cache yang lambat di satu key tidak menahan key lain"""
+        # Setup
+        pool = process.KeyPool(['KEY1', 'KEY2'])
+        release_slow = threading.Event()
+        slow_client, fast_client = MagicMock(), MagicMock()
+        slow_client.create_cached_content.side_effect = lambda **kwargs: (release_slow.wait(5), MagicMock())[1]
+        fast_client.create_cached_content.return_value.name = 'cachedContents/cepat'
+        clients = {'KEY1': slow_client, 'KEY2': fast_client}
+
+        with patch.object(process.glm, 'CacheServiceClient', side_effect=lambda client_options: clients[client_options['api_key']]), \
+             patch.object(pool, 'get_client', return_value=MagicMock()):
+            slow_thread = threading.Thread(target=pool.get_cached_model, args=(0, 'gemini-test', 'prefix '))
+            slow_thread.start()
+            # Tunggu sampai thread lambat sedang membuat cache
+            while not slow_client.create_cached_content.called:
+                release_slow.wait(0.01)
+
+            # Eksekusi: key lain tetap bisa membuat cache selama key pertama tertahan
+            model = pool.get_cached_model(1, 'gemini-test', 'prefix ')
+            still_blocked = slow_thread.is_alive()
+            release_slow.set()
+            slow_thread.join(5)
+
+        # Verifikasi
+        assert still_blocked
+        assert model.cached_content == 'cachedContents/cepat'
+
+
+class TestRequestTimeout:
+    """Test suite untuk fungsi _request_timeout"""
+    
+    def test_request_timeout_follows_p95(self):
+        """Test bahwa timeout mengikuti p95 dan tetap dalam batas"""
+        tracker = MagicMock()
+        
+        with patch.object(process, 'get_request_tracker', return_value=tracker):
+            tracker.get_p95_response_time.return_value = None
+            assert process._request_timeout('gemini-test') == process.REQUEST_TIMEOUT_MAX
+            
+            tracker.get_p95_response_time.return_value = 40.0
+            assert process._request_timeout('gemini-test') == pytest.approx(60.0)
+            
+            tracker.get_p95_response_time.return_value = 2.0
+            assert process._request_timeout('gemini-test') == process.REQUEST_TIMEOUT_MIN
+
+    def test_request_timeout_doubles_after_deadline(self):
+        """Test bahwa timeout naik setelah DeadlineExceeded meskipun p95 rendah"""
+        # Setup
+        tracker = MagicMock()
+        tracker.get_p95_response_time.return_value = 2.0
+
+        # Eksekusi
+        with patch.object(process, 'get_request_tracker', return_value=tracker), \
+             patch.dict(process._REQUEST_TIMEOUT_FLOOR, clear=True):
+            process._record_request_timeout('gemini-test', process.REQUEST_TIMEOUT_MIN)
+            timeout = process._request_timeout('gemini-test')
+            other_timeout = process._request_timeout('gemini-lain')
+
+        # Verifikasi
+        tracker.record_timeout.assert_called_once_with('gemini-test', process.REQUEST_TIMEOUT_MIN)
+        assert timeout == pytest.approx(2 * process.REQUEST_TIMEOUT_MIN)
+        assert other_timeout == process.REQUEST_TIMEOUT_MIN
+
+
+class TestFindOptimalBatches:
+    """Test suite untuk fungsi find_optimal_batches"""
+    
+    def test_find_optimal_batches_skips_complete_and_partial(self):
+        """Test bahwa hanya batch yang belum berlabel sama sekali yang diproses"""
+        df = pd.DataFrame({'label': [None, None, 'positif', None, 'negatif', 'netral', None]})
+        
+        # Batch: [0,2) kosong, [2,4) parsial, [4,6) lengkap, [6,7) kosong
+        assert process.find_optimal_batches(df, 2) == [(0, 2), (6, 7)]
+        assert process.find_optimal_batches(df.iloc[:0], 2) == []
+
+
+class TestDumpsBatchJson:
+    """Test suite untuk fungsi _dumps_batch_json"""
+    
+    def test_dumps_batch_json_compact_roundtrip(self):
+        """Test bahwa JSON batch ringkas dan tetap bisa di-parse ulang"""
+        # Setup
+        data = [{'id': np.int64(1), 'text': 'Produk bagus'}, {'id': 2, 'text': 'Kurang "oke"'}]
+        
+        # Eksekusi
+        result = process._dumps_batch_json(data)
+        
+        # Verifikasi
+        assert '\n' not in result
+        assert json.loads(result) == [{'id': 1, 'text': 'Produk bagus'}, {'id': 2, 'text': 'Kurang "oke"'}]
+
+
+class TestTruncateToBalanced:
+    """Test suite untuk fungsi _truncate_to_balanced"""
+    
+    def test_truncate_to_balanced_drops_incomplete_tail(self):
+        """Test bahwa objek terakhir yang terpotong dibuang dan array ditutup"""
+        # Setup: kurung di dalam string tidak boleh ikut dihitung
+        text = '[{"id": 1, "justifikasi": "pakai ] dan } \\"kutip\\" [x]"}, {"id": 2, "label": "pos'
+        
+        # Eksekusi
+        fixed = process._truncate_to_balanced(text)
+        
+        # Verifikasi
+        assert json.loads(fixed) == [{"id": 1, "justifikasi": 'pakai ] dan } "kutip" [x]'}]
+    
+    def test_truncate_to_balanced_handles_nested_values(self):
+        """Test bahwa objek dengan nilai array/objek bersarang tetap utuh"""
+        text = '[{"id": 1, "tags": ["a", {"b": 1}]}, {"id": 2, "tags": ["c"'
+        
+        assert json.loads(process._truncate_to_balanced(text)) == [{"id": 1, "tags": ["a", {"b": 1}]}]
+    
+    def test_truncate_to_balanced_without_complete_object(self):
+        """Test bahwa None dikembalikan jika tidak ada objek yang lengkap"""
+        assert process._truncate_to_balanced('[{"id": 1, "label": "po') is None
+
+
+class TestCommitBatchResult:
+    """Test suite untuk fungsi _commit_batch_result"""
+    
+    def test_commit_batch_result_updates_progress_incrementally(self):
+        """Test bahwa progress_info bertambah sesuai baris yang dilabeli, termasuk duplikat"""
+        # Setup
+        working_df = pd.DataFrame({
+            'id': [0, 1, 2, 3],
+            'text': ['halo', 'dunia', 'halo', 'lain'],
+            'label': pd.array([None, None, None, 'positif'], dtype=process.RESULT_DTYPE),
+            'justifikasi': pd.array([None, None, None, 'x'], dtype=process.RESULT_DTYPE),
+        })
+        progress_info = {'total': 4, 'labeled': 1, 'unlabeled': 3, 'percent': 25.0}
+        output = [{'id': 0, 'label': 'positif', 'justifikasi': 'a'}, {'id': 1, 'label': 'negatif', 'justifikasi': 'b'}]
+        _, _, output_df = process._validate_batch_output(output, np.array([0, 1]), frozenset())
+        job = {'start': 0, 'end': 4, 'positions': np.array([0, 1]), 'item_count': 2, 'items_skipped': 1, 'batch_info': None}
+        result = {'status': 'valid', 'output_list': output, 'output_df': output_df, 'model_used': 'gemini-test', 'api_key_index': 1}
+        
+        # Eksekusi
+        process._commit_batch_result(working_df, MagicMock(), 'text', MagicMock(), job, result, progress_info, process.DuplicateIndex(working_df['text']))
+        
+        # Verifikasi: 2 hasil API + 1 duplikat 'halo'
+        assert progress_info['labeled'] == int(working_df['label'].count()) == 4
+        assert progress_info['unlabeled'] == 0
+        assert progress_info['percent'] == pytest.approx(100.0)
@@ -0,0 +1,96 @@
+# tests/unit/test_request_tracker.py
+
+import os
+import logging
+import sys
+import pytest
+from unittest.mock import patch
+
+# Menambahkan path root project untuk import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.core_logic.request_tracker import RequestTracker
+
+
+class TestRequestTrackerMaybeSave:
+    """Test suite untuk RequestTracker.maybe_save"""
+
+    def test_record_request_does_not_write_stats_file(self, tmp_path):
+        """Test bahwa mencatat request tidak langsung menulis file statistik"""
+        # Setup
+        tracker = RequestTracker(stats_file=str(tmp_path / "stats.json"))
+
+        # Eksekusi
+        for _ in range(25):
+            tracker.record_request(api_key_index=1, model_name='gemini-test', success=True, response_time=0.5)
+
+        # Verifikasi
+        assert not os.path.exists(tracker.stats_file)
+
+    def test_maybe_save_respects_count_threshold(self, tmp_path):
+        """Test bahwa maybe_save hanya menyimpan setelah cukup banyak request baru"""
+        # Setup
+        tracker = RequestTracker(stats_file=str(tmp_path / "stats.json"))
+        for _ in range(3):
+            tracker.record_request(api_key_index=1, model_name='gemini-test', success=True, response_time=0.5)
+
+        with patch.object(tracker, '_save_session_stats') as mock_save:
+            # Eksekusi & Verifikasi: di bawah ambang, tidak menyimpan
+            assert tracker.maybe_save(min_interval=60, min_count=5) is False
+            for _ in range(2):
+                tracker.record_request(api_key_index=1, model_name='gemini-test', success=True, response_time=0.5)
+            assert tracker.maybe_save(min_interval=60, min_count=5) is True
+            # Setelah disimpan, tidak ada request baru yang perlu ditulis
+            assert tracker.maybe_save(min_interval=0, min_count=1) is False
+
+        mock_save.assert_called_once()
+
+    def test_maybe_save_respects_interval_threshold(self, tmp_path):
+        """Test bahwa maybe_save menyimpan jika request tertua sudah melewati interval"""
+        # Setup
+        tracker = RequestTracker(stats_file=str(tmp_path / "stats.json"))
+        tracker.record_request(api_key_index=1, model_name='gemini-test', success=False, response_time=1.0)
+
+        # Eksekusi
+        saved = tracker.maybe_save(min_interval=0, min_count=100)
+
+        # Verifikasi
+        assert saved is True
+        assert os.path.exists(tracker.stats_file)
+
+
+class TestRequestTrackerTimeout:
+    """Test suite untuk RequestTracker.record_timeout"""
+
+    def test_record_timeout_raises_p95(self, tmp_path):
+        """Test bahwa request yang timeout ikut menaikkan p95 response time"""
+        # Setup
+        tracker = RequestTracker(stats_file=str(tmp_path / "stats.json"))
+        for _ in range(10):
+            tracker.record_request(api_key_index=1, model_name='gemini-test', success=True, response_time=2.0)
+
+        # Eksekusi
+        for _ in range(2):
+            tracker.record_timeout('gemini-test', 30.0)
+
+        # Verifikasi
+        assert tracker.get_p95_response_time('gemini-test') == pytest.approx(30.0)
+
+
+class TestRequestTrackerFlush:
+    """Test suite untuk RequestTracker.flush"""
+
+    def test_flush_writes_stats_without_info_logs(self, tmp_path, caplog):
+        """Test bahwa flush langsung menulis statistik tanpa log INFO per penyimpanan"""
+        # Setup
+        tracker = RequestTracker(stats_file=str(tmp_path / "stats.json"))
+        tracker.record_request(api_key_index=1, model_name='gemini-test', success=True, response_time=0.5)
+
+        # Eksekusi
+        with caplog.at_level(logging.INFO):
+            tracker.flush()
+
+        # Verifikasi
+        assert os.path.exists(tracker.stats_file)
+        assert tracker.maybe_save(min_interval=0, min_count=1) is False
+        assert not [record for record in caplog.records if record.levelno == logging.INFO]
@@ -0,0 +1,73 @@
+# tests/unit/test_response_cache.py
+
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+# Menambahkan path root project untuk import
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.core_logic import response_cache
+from src.core_logic.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test suite untuk class ResponseCache"""
+
+    def test_response_cache_roundtrip(self, tmp_path):
+        """Test bahwa output tersimpan bisa dibaca kembali setelah cache dibuka ulang"""
+        # Setup
+        db_path = str(tmp_path / "cache.sqlite")
+        output = [{'id': 0, 'label': 'positif', 'justifikasi': 'bagus'}]
+        key = ResponseCache.make_key('gemini-test', {'temperature': 0.3}, 'prompt')
+
+        # Eksekusi
+        cache = ResponseCache(db_path)
+        cache.set(key, output)
+        cache.close()
+        reopened = ResponseCache(db_path)
+
+        # Verifikasi
+        assert reopened.get(key) == output
+        assert reopened.get(ResponseCache.make_key('gemini-lain', {'temperature': 0.3}, 'prompt')) is None
+        reopened.close()
+
+    def test_response_cache_expires_entries(self, tmp_path):
+        """Test bahwa entri lebih tua dari TTL tidak dikembalikan"""
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_seconds=10)
+
+        with patch.object(response_cache.time, 'time', return_value=1000.0):
+            cache.set('key', [1])
+        with patch.object(response_cache.time, 'time', return_value=1011.0):
+            assert cache.get('key') is None
+        cache.close()
+
+    def test_response_cache_evicts_least_recently_used(self, tmp_path):
+        """Test bahwa entri yang paling lama tidak dipakai dibuang saat melebihi batas"""
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+
+        with patch.object(response_cache.time, 'time', return_value=1.0):
+            cache.set('a', ['a'])
+        with patch.object(response_cache.time, 'time', return_value=2.0):
+            cache.set('b', ['b'])
+        with patch.object(response_cache.time, 'time', return_value=3.0):
+            assert cache.get('a') == ['a']
+        with patch.object(response_cache.time, 'time', return_value=4.0):
+            cache.set('c', ['c'])
+
+        # Verifikasi: 'b' paling lama tidak dipakai
+        with patch.object(response_cache.time, 'time', return_value=5.0):
+            assert cache.get('b') is None
+            assert cache.get('a') == ['a']
+            assert cache.get('c') == ['c']
+        cache.close()
+
+
+class TestOpenResponseCache:
+    """Test suite untuk fungsi open_response_cache"""
+
+    def test_open_response_cache_disabled(self, tmp_path):
+        """Test bahwa RESPONSE_CACHE=false menonaktifkan cache"""
+        assert response_cache.open_response_cache(str(tmp_path), enabled=False) is None
+        assert not os.path.exists(tmp_path / ".gemini_cache.sqlite")